@@ -11,26 +11,79 @@ Trigger: After Write/Edit operations on Python files
 """
 
 import os
+import re
 import json
 import sys
+import atexit
+import hashlib
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-# Add hooks utils to path
+# Add hooks utils to path (already there when the hook runs as a script)
 hooks_dir = Path(__file__).parent
-sys.path.insert(0, str(hooks_dir))
+if str(hooks_dir) not in sys.path:
+    sys.path.insert(0, str(hooks_dir))
 
 from utils.file_utils import (
+    find_python_files,
     get_use_case_root,
-    is_python_file,
-    get_relative_path
-)
-from utils.duplication_detector import (
-    DuplicationDetector,
-    detect_duplications_in_file,
-    calculate_dry_score,
-    generate_dry_recommendations
+    is_in_use_case,
+    is_python_file
 )
+from hooks_daemon import forward_to_daemon
+from utils.json_utils import dumps
+
+# utils.duplication_detector (and the ast and tokenize machinery it pulls in)
+# is imported by the functions that analyze code, so a hook that hands its
+# request to the daemon never pays for it
+
+# Pre-serialized response for the common "nothing to do" path
+_CONTINUE = '{"action": "continue"}'
+
+# Persistent cache of analysis results:
+# path -> (mtime_ns, sha256, digest of the compared src/ files, analysis),
+# least recently used first
+DUP_CACHE_FILE = Path.home() / ".cache" / "claude_hooks" / "dup_cache.json"
+_ANALYSIS_CACHE: Dict[str, Tuple[int, str, str, Dict]] = {}
+
+# Most analyses kept in the cache (oldest are evicted first)
+MAX_CACHED_ANALYSES = 200
+_cache_loaded = False
+_cache_dirty = False
+
+# Test files, hook files, __init__.py and migrations are never analyzed
+_SKIP_RE = re.compile(r'(/test|/\.claude/hooks/|/migrations/|/alembic/|__init__\.py$|_test\.py$)')
+
+
+_SEVERITY_ICONS = {
+    "critical": "🚨",
+    "warning": "⚠️",
+    "info": "💡",
+    "clean": "✅"
+}
+
+# Next-step guidance lines emitted for each severity level
+_NEXT_STEPS = {
+    "critical": (
+        "🚨 IMMEDIATE ACTION REQUIRED:",
+        "   • Address high-severity duplications before proceeding",
+        "   • Extract common logic into shared utilities",
+        "   • Consider refactoring for better code organization"
+    ),
+    "warning": (
+        "⚠️ IMPROVEMENT RECOMMENDED:",
+        "   • Review duplicated code for refactoring opportunities",
+        "   • Consider extracting common patterns"
+    ),
+    "info": (
+        "💡 MINOR IMPROVEMENTS POSSIBLE:",
+        "   • Small duplications detected - consider minor refactoring"
+    ),
+    "clean": (
+        "✅ EXCELLENT DRY COMPLIANCE:",
+        "   • Code is well-organized with minimal duplication"
+    )
+}
 
 
 def should_check_duplication(file_path: str, tool: str) -> bool:
@@ -52,45 +105,145 @@ def should_check_duplication(file_path: str, tool: str) -> bool:
     if not is_python_file(file_path):
         return False
     
-    # Skip test files (they often have similar structure patterns)
-    if "/test" in file_path or file_path.endswith("_test.py"):
+    # Skip test files (they often have similar structure patterns), hook files,
+    # __init__.py files (usually minimal) and migration files
+    if _SKIP_RE.search(file_path):
         return False
     
-    # Skip hook files
-    if "/.claude/hooks/" in file_path:
+    # Only process files in the use-case directory
+    if not is_in_use_case(file_path):
         return False
     
-    # Skip __init__.py files (usually minimal)
-    if file_path.endswith("__init__.py"):
+    # Check if file is substantial enough to analyze
+    # (stop reading as soon as 10 non-empty lines have been seen)
+    count = 0
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if line.strip():
+                    count += 1
+                    if count >= 10:
+                        break
+    except Exception:
         return False
     
-    # Skip migration files
-    if "/migrations/" in file_path or "/alembic/" in file_path:
-        return False
+    # Skip very small files (less than 10 non-empty lines)
+    return count >= 10
+
+
+def _file_sha(file_path: str) -> str:
+    """
+    Compute the SHA-256 digest of a file using a streaming read.
     
-    # Only process files in the use-case directory
-    use_case_root = get_use_case_root()
-    if use_case_root and use_case_root not in file_path:
-        return False
+    Args:
+        file_path: Path to the file to hash
+        
+    Returns:
+        Hex digest of the file contents
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(65536):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_analysis_cache() -> None:
+    """Load the persisted analysis cache from disk (once per process)."""
+    global _cache_loaded
+    if _cache_loaded:
+        return
+    _cache_loaded = True
     
-    # Check if file is substantial enough to analyze
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            # Skip very small files (less than 10 non-empty lines)
-            non_empty_lines = [line.strip() for line in content.split('\n') if line.strip()]
-            if len(non_empty_lines) < 10:
-                return False
+        with open(DUP_CACHE_FILE, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        # Entries are stored least recently used first; keep the newest
+        for path, entry in list(stored.items())[-MAX_CACHED_ANALYSES:]:
+            mtime_ns, digest, candidates, analysis = entry
+            _ANALYSIS_CACHE[path] = (mtime_ns, digest, candidates, analysis)
     except Exception:
-        return False
+        # Missing or corrupt cache - start fresh
+        _ANALYSIS_CACHE.clear()
+    
+    atexit.register(_save_analysis_cache)
+
+
+def _save_analysis_cache() -> None:
+    """Persist the analysis cache to disk if it was modified."""
+    global _cache_dirty
+    if not _cache_dirty:
+        return
+    
+    try:
+        DUP_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent hooks never read a partial file
+        temp_path = f"{DUP_CACHE_FILE}.{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(_ANALYSIS_CACHE, f)
+        os.replace(temp_path, DUP_CACHE_FILE)
+        _cache_dirty = False
+    except Exception:
+        pass  # Caching is best-effort
+
+
+def _remember_analysis(file_path: str, entry: Tuple[int, str, str, Dict]) -> None:
+    """Store an analysis cache entry as the most recently used one, evicting the oldest."""
+    global _cache_dirty
+    _ANALYSIS_CACHE.pop(file_path, None)
+    _ANALYSIS_CACHE[file_path] = entry
+    while len(_ANALYSIS_CACHE) > MAX_CACHED_ANALYSES:
+        del _ANALYSIS_CACHE[next(iter(_ANALYSIS_CACHE))]
+    _cache_dirty = True
+
+
+def _candidates_digest(file_path: str) -> str:
+    """
+    Digest the state of the files a file is compared against.
+    
+    An analysis depends on every other Python file under src/, so cached
+    results are only valid while none of them was added, removed or changed.
     
-    return True
+    Args:
+        file_path: File being analyzed (excluded; it is validated separately)
+        
+    Returns:
+        Hex digest over the paths, mtimes and sizes of the other src/ files
+    """
+    h = hashlib.sha1()
+    for path in sorted(find_python_files(os.path.join(get_use_case_root(), "src"))):
+        if path == file_path:
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        h.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return h.hexdigest()
+
+
+def warm_up() -> None:
+    """
+    Preload caches ahead of the first request (called by the hooks daemon).
+    
+    Loads the persisted analysis cache and the code blocks of the use-case
+    src/ directory, so the first check of a session compares against a warm
+    baseline.
+    """
+    from utils.duplication_detector import preload_blocks
+    
+    _load_analysis_cache()
+    preload_blocks(os.path.join(get_use_case_root(), "src"), min_lines=3)
 
 
 def analyze_file_duplications(file_path: str) -> Dict:
     """
     Analyze the given file for code duplications.
     
+    Results are cached by file digest together with the state of the other
+    src/ files, so re-running the hook while nothing changed returns the
+    previous analysis without re-parsing.
+    
     Args:
         file_path: Path to the file to analyze
         
@@ -98,11 +251,38 @@ def analyze_file_duplications(file_path: str) -> Dict:
         Dictionary with duplication analysis results
     """
     try:
-        return detect_duplications_in_file(
+        _load_analysis_cache()
+        
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        candidates = _candidates_digest(file_path)
+        cached = _ANALYSIS_CACHE.get(file_path)
+        if cached and cached[2] != candidates:
+            cached = None  # Other files changed - the verdict may have too
+        if cached and cached[0] == mtime_ns:
+            _ANALYSIS_CACHE[file_path] = _ANALYSIS_CACHE.pop(file_path)  # Most recently used
+            return cached[3]
+        
+        digest = _file_sha(file_path)
+        if cached and cached[1] == digest:
+            # Touched but unchanged - refresh the mtime and reuse the analysis
+            _remember_analysis(file_path, (mtime_ns, digest, candidates, cached[3]))
+            _save_analysis_cache()
+            return cached[3]
+        
+        from utils.duplication_detector import detect_duplications_in_file
+        
+        analysis = detect_duplications_in_file(
             file_path, 
             min_lines=3, 
-            similarity_threshold=0.75  # Slightly lower threshold for real-time checking
+            similarity_threshold=0.75,  # Slightly lower threshold for real-time checking
+            prefilter_min_shared=2  # Skip files sharing fewer than 2 fingerprint hashes with this one
         )
+        
+        _remember_analysis(file_path, (mtime_ns, digest, candidates, analysis))
+        # Saved right away rather than only at exit, which for the daemon
+        # may be hours away
+        _save_analysis_cache()
+        return analysis
     except Exception as e:
         return {
             "file": file_path,
@@ -117,63 +297,84 @@ def analyze_file_duplications(file_path: str) -> Dict:
         }
 
 
-def categorize_duplication_severity(analysis: Dict) -> str:
+def classify_duplications(high_count: int, medium_count: int, total_count: int,
+                          dry_score: int) -> Tuple[str, bool]:
     """
-    Categorize the overall duplication severity for the file.
+    Classify duplication severity and decide whether to block in one pass.
     
     Args:
-        analysis: Duplication analysis results
+        high_count: Number of high-severity duplications
+        medium_count: Number of medium-severity duplications
+        total_count: Total number of duplications
+        dry_score: DRY compliance score (0-100)
         
     Returns:
-        Severity level: "critical", "warning", "info", or "clean"
+        Tuple of (severity, should_block) where severity is "critical",
+        "warning", "info", or "clean"
     """
-    high_count = analysis.get("high_severity", 0)
-    medium_count = analysis.get("medium_severity", 0)
-    total_count = analysis.get("total_duplications", 0)
-    dry_score = analysis.get("dry_score", 100)
+    # Generally, don't block operations for duplication issues - only in
+    # extreme cases with many high-severity duplications and a very low score
+    should_block = high_count >= 5 and dry_score < 40
     
     if high_count >= 3 or dry_score < 60:
-        return "critical"
+        return "critical", should_block
     elif high_count >= 1 or medium_count >= 3 or dry_score < 80:
-        return "warning"
+        return "warning", should_block
     elif total_count > 0:
-        return "info"
+        return "info", should_block
     else:
-        return "clean"
+        return "clean", should_block
+
 
+def _classify_analysis(analysis: Dict) -> Tuple[str, bool]:
+    """Classify an analysis dictionary via classify_duplications."""
+    return classify_duplications(
+        analysis.get("high_severity", 0),
+        analysis.get("medium_severity", 0),
+        analysis.get("total_duplications", 0),
+        analysis.get("dry_score", 100)
+    )
 
-def generate_feedback_message(analysis: Dict, file_path: str) -> str:
+
+def categorize_duplication_severity(analysis: Dict) -> str:
+    """
+    Categorize the overall duplication severity for the file.
+    
+    Args:
+        analysis: Duplication analysis results
+        
+    Returns:
+        Severity level: "critical", "warning", "info", or "clean"
+    """
+    return _classify_analysis(analysis)[0]
+
+
+def generate_feedback_message(analysis: Dict, file_path: str, severity: Optional[str] = None) -> str:
     """
     Generate a feedback message about duplication analysis.
     
     Args:
         analysis: Duplication analysis results
         file_path: Path to the analyzed file
+        severity: Precomputed severity (computed from analysis if omitted)
         
     Returns:
         Formatted feedback message
     """
-    lines = []
-    
-    use_case_root = get_use_case_root()
-    relative_path = get_relative_path(file_path, use_case_root)
+    # Strip the use-case root with a plain prefix check rather than pathlib
+    root_prefix = (get_use_case_root() or '').rstrip('/') + '/'
+    relative_path = file_path.removeprefix(root_prefix)
     dry_score = analysis.get("dry_score", 100)
+    if severity is None:
+        severity = categorize_duplication_severity(analysis)
     
-    # Header
-    severity = categorize_duplication_severity(analysis)
-    severity_icons = {
-        "critical": "🚨",
-        "warning": "⚠️", 
-        "info": "💡",
-        "clean": "✅"
-    }
-    
-    lines.append(f"{severity_icons.get(severity, '📊')} DRY COMPLIANCE CHECK: {relative_path}")
-    lines.append("=" * 50)
-    
-    # DRY Score
+    # Header and DRY score
     score_icon = "✅" if dry_score >= 80 else "⚠️" if dry_score >= 60 else "🚨"
-    lines.append(f"DRY Score: {dry_score}/100 {score_icon}")
+    lines = [
+        f"{_SEVERITY_ICONS.get(severity, '📊')} DRY COMPLIANCE CHECK: {relative_path}",
+        "=" * 50,
+        f"DRY Score: {dry_score}/100 {score_icon}"
+    ]
     
     # Duplication summary
     total_duplications = analysis.get("total_duplications", 0)
@@ -182,8 +383,7 @@ def generate_feedback_message(analysis: Dict, file_path: str) -> str:
     low_severity = analysis.get("low_severity", 0)
     
     if total_duplications == 0:
-        lines.append("🎉 No code duplications detected!")
-        lines.append("Code follows DRY principles well.")
+        lines.extend(("🎉 No code duplications detected!", "Code follows DRY principles well."))
     else:
         lines.append(f"📊 Duplications found: {total_duplications} total")
         if high_severity > 0:
@@ -198,14 +398,14 @@ def generate_feedback_message(analysis: Dict, file_path: str) -> str:
     high_severity_dups = [d for d in duplications if d["severity"] == "high"]
     
     if high_severity_dups:
-        lines.append("")
-        lines.append("🚨 HIGH SEVERITY DUPLICATIONS:")
+        lines.extend(("", "🚨 HIGH SEVERITY DUPLICATIONS:"))
         
         for i, dup in enumerate(high_severity_dups[:2]):  # Show first 2 high severity
             lines.append(f"   {i+1}. Similarity: {dup['similarity']:.1%}")
-            for block in dup["blocks"]:
-                block_path = get_relative_path(block["file"], use_case_root)
-                lines.append(f"      📁 {block_path}:{block['lines']} ({block['line_count']} lines)")
+            lines.extend(
+                f"      📁 {block['file'].removeprefix(root_prefix)}:{block['lines']} ({block['line_count']} lines)"
+                for block in dup["blocks"]
+            )
             
             # Show first suggestion
             if dup["suggestions"]:
@@ -217,33 +417,16 @@ def generate_feedback_message(analysis: Dict, file_path: str) -> str:
     # Recommendations
     recommendations = analysis.get("recommendations", [])
     if recommendations and severity in ["critical", "warning"]:
-        lines.append("")
-        lines.append("🔧 REFACTORING RECOMMENDATIONS:")
-        for i, rec in enumerate(recommendations[:3], 1):  # Show first 3 recommendations
-            lines.append(f"   {i}. {rec}")
+        lines.extend(("", "🔧 REFACTORING RECOMMENDATIONS:"))
+        lines.extend(f"   {i}. {rec}" for i, rec in enumerate(recommendations[:3], 1))  # Show first 3 recommendations
     
     # Next steps based on severity
     lines.append("")
-    if severity == "critical":
-        lines.append("🚨 IMMEDIATE ACTION REQUIRED:")
-        lines.append("   • Address high-severity duplications before proceeding")
-        lines.append("   • Extract common logic into shared utilities")
-        lines.append("   • Consider refactoring for better code organization")
-    elif severity == "warning":
-        lines.append("⚠️ IMPROVEMENT RECOMMENDED:")
-        lines.append("   • Review duplicated code for refactoring opportunities")
-        lines.append("   • Consider extracting common patterns")
-    elif severity == "info":
-        lines.append("💡 MINOR IMPROVEMENTS POSSIBLE:")
-        lines.append("   • Small duplications detected - consider minor refactoring")
-    else:
-        lines.append("✅ EXCELLENT DRY COMPLIANCE:")
-        lines.append("   • Code is well-organized with minimal duplication")
+    lines.extend(_NEXT_STEPS.get(severity, _NEXT_STEPS["clean"]))
     
     # Error handling
     if analysis.get("error"):
-        lines.append("")
-        lines.append(f"⚠️ Analysis error: {analysis['error']}")
+        lines.extend(("", f"⚠️ Analysis error: {analysis['error']}"))
     
     return "\n".join(lines)
 
@@ -258,31 +441,24 @@ def should_block_operation(analysis: Dict) -> bool:
     Returns:
         True if operation should be blocked (for very severe cases)
     """
-    # Generally, don't block operations for duplication issues
-    # This is informational feedback to encourage good practices
-    # Only block in extreme cases
-    
-    high_severity = analysis.get("high_severity", 0)
-    dry_score = analysis.get("dry_score", 100)
-    
-    # Block only in extreme cases where there are many high-severity duplications
-    # and very low DRY score
-    return high_severity >= 5 and dry_score < 40
+    return _classify_analysis(analysis)[1]
 
 
-def generate_duplication_summary(analysis: Dict) -> str:
+def generate_duplication_summary(analysis: Dict, severity: Optional[str] = None) -> str:
     """
     Generate a brief summary for less severe cases.
     
     Args:
         analysis: Duplication analysis results
+        severity: Precomputed severity (computed from analysis if omitted)
         
     Returns:
         Brief summary message
     """
     dry_score = analysis.get("dry_score", 100)
     total_duplications = analysis.get("total_duplications", 0)
-    severity = categorize_duplication_severity(analysis)
+    if severity is None:
+        severity = categorize_duplication_severity(analysis)
     
     if severity == "clean":
         return f"✅ DRY compliance: {dry_score}/100 - No duplications detected"
@@ -296,33 +472,28 @@ def generate_duplication_summary(analysis: Dict) -> str:
             return f"⚠️ DRY compliance: {dry_score}/100 - {total_duplications} duplications detected"
 
 
-def main():
+def handle_request(input_data: str) -> str:
     """
-    Main hook function called by Claude Code.
+    Process a single hook request and build the JSON response.
     
-    Expected input format (from stdin):
-    {
-        "tool": "Write" | "Edit",
-        "path": "/path/to/file.py",
-        "content": "file content...",
-        "arguments": {...}
-    }
+    Args:
+        input_data: Raw hook input (JSON string from Claude Code)
+        
+    Returns:
+        Serialized JSON response for Claude Code
     """
     try:
-        # Read input from stdin
-        input_data = sys.stdin.read().strip()
+        input_data = input_data.strip()
         if not input_data:
             # No input, allow operation to continue
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
         
         # Parse the input
         try:
             data = json.loads(input_data)
         except json.JSONDecodeError:
             # Invalid JSON, allow operation to continue
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
         
         # Extract file path and tool
         file_path = data.get("path", "")
@@ -330,23 +501,21 @@ def main():
         
         # Check if we should analyze for duplications
         if not should_check_duplication(file_path, tool):
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
         
         # Analyze the file for duplications
         analysis = analyze_file_duplications(file_path)
         
         # Determine severity and response
-        severity = categorize_duplication_severity(analysis)
-        should_block = should_block_operation(analysis)
+        severity, should_block = _classify_analysis(analysis)
         
         if severity in ["critical", "warning"]:
             # Provide detailed feedback for significant issues
-            feedback_message = generate_feedback_message(analysis, file_path)
+            feedback_message = generate_feedback_message(analysis, file_path, severity)
             
             if should_block:
                 # Block operation for extreme cases
-                print(json.dumps({
+                return dumps({
                     "action": "continue",
                     "feedback": feedback_message,
                     "prompt": (
@@ -355,38 +524,57 @@ def main():
                         "to eliminate redundancy before proceeding. This will improve code "
                         "maintainability and follow DRY principles."
                     )
-                }))
-            else:
-                # Continue with detailed feedback
-                print(json.dumps({
-                    "action": "continue",
-                    "message": feedback_message
-                }))
-        
-        elif severity == "info":
-            # Brief feedback for minor issues
-            summary = generate_duplication_summary(analysis)
-            print(json.dumps({
+                })
+            
+            # Continue with detailed feedback
+            return dumps({
                 "action": "continue",
-                "message": summary
-            }))
+                "message": feedback_message
+            })
         
-        else:
-            # Clean code - minimal feedback
-            summary = generate_duplication_summary(analysis)
-            print(json.dumps({
-                "action": "continue",
-                "message": summary
-            }))
+        # Brief feedback for minor issues or clean code
+        summary = generate_duplication_summary(analysis, severity)
+        return dumps({
+            "action": "continue",
+            "message": summary
+        })
     
     except Exception as e:
         # Handle any unexpected errors gracefully
         error_message = f"⚠️ Duplication check hook error: {str(e)}. Continuing with operation."
-        print(json.dumps({
+        return dumps({
             "action": "continue",
             "message": error_message
-        }))
+        })
+
+
+def main():
+    """
+    Main hook function called by Claude Code.
+    
+    Forwards the request to the warm hooks daemon when available and falls
+    back to processing it in this process otherwise.
+    
+    Expected input format (from stdin):
+    {
+        "tool": "Write" | "Edit",
+        "path": "/path/to/file.py",
+        "content": "file content...",
+        "arguments": {...}
+    }
+    """
+    input_data = sys.stdin.read()
+    if not input_data.strip():
+        # No input, allow operation to continue without any encoding work
+        sys.stdout.write(_CONTINUE + "\n")
+        return
+    
+    response = forward_to_daemon("check_duplication", input_data)
+    if response is None:
+        response = handle_request(input_data)
+    
+    print(response)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
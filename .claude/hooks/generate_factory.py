@@ -11,27 +11,50 @@ Trigger: After Write/Edit operations on Python files containing models
 """
 
 import os
+import re
 import json
 import sys
-import ast
+import hashlib
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-# Add hooks utils to path
+# Add hooks utils to path (already there when the hook runs as a script)
 hooks_dir = Path(__file__).parent
-sys.path.insert(0, str(hooks_dir))
+if str(hooks_dir) not in sys.path:
+    sys.path.insert(0, str(hooks_dir))
 
+from hooks_daemon import forward_to_daemon
+from utils.json_utils import dumps, loads
 from utils.file_utils import (
     get_use_case_root,
+    is_in_use_case,
+    cached_exists,
+    list_directory,
     ensure_directory_exists,
     is_python_file,
     is_model_file,
     get_relative_path
 )
-from utils.factory_generator import (
-    FactoryGenerator,
-    ModelParser
-)
+
+# utils.factory_generator (and the ast module it pulls in) is imported lazily:
+# most Write/Edit calls are rejected by should_generate_factory and never
+# need it
+
+# Pre-serialized response for the common "nothing to do" path
+_CONTINUE = '{"action": "continue"}'
+
+# Test files, hook files and factory files (any case) never get factories
+_SKIP_RE = re.compile(r'(/test|_test\.py$|/\.claude/hooks/|(?i:factory))')
+
+# Templates for the generated factory, factories/__init__.py and conftest.py
+TEMPLATES_DIR = hooks_dir / "templates"
+
+# Parsed models per file, validated against the file's (mtime_ns, size)
+MODEL_CACHE_DIR = Path.home() / ".cache" / "claude_hooks" / "model_parse"
+
+# Bumped whenever the cached model dictionaries change shape
+MODEL_CACHE_VERSION = 2
 
 
 def should_generate_factory(file_path: str, tool: str) -> bool:
@@ -53,27 +76,32 @@ def should_generate_factory(file_path: str, tool: str) -> bool:
     if not is_python_file(file_path):
         return False
     
-    # Skip test files
-    if "/test" in file_path or file_path.endswith("_test.py"):
-        return False
-    
-    # Skip hook files
-    if "/.claude/hooks/" in file_path:
-        return False
-    
-    # Skip factory files themselves
-    if "factory" in file_path.lower():
+    # Skip test files, hook files and factory files themselves
+    if _SKIP_RE.search(file_path):
         return False
     
     # Only process files in the use-case directory
-    use_case_root = get_use_case_root()
-    if use_case_root and use_case_root not in file_path:
+    if not is_in_use_case(file_path):
         return False
     
     # Check if the file contains models
     return is_model_file(file_path)
 
 
+def _might_need_factory(raw_input: bytes) -> bool:
+    """
+    Cheaply rule out hook payloads that should_generate_factory would reject.
+    
+    Args:
+        raw_input: Raw JSON hook payload
+        
+    Returns:
+        False if the payload certainly names no Python file written or
+        edited; True if it has to be parsed to decide
+    """
+    return b'.py"' in raw_input and (b'"Write"' in raw_input or b'"Edit"' in raw_input)
+
+
 def get_factory_file_path(model_file_path: str) -> str:
     """
     Determine where the factory file should be created.
@@ -89,30 +117,100 @@ def get_factory_file_path(model_file_path: str) -> str:
     # Extract model name from file path
     model_name = Path(model_file_path).stem
     
-    # Common factory file locations (in order of preference)
-    potential_locations = [
-        os.path.join(use_case_root, "tests", "factories", f"{model_name}_factory.py"),
-        os.path.join(use_case_root, "tests", f"{model_name}_factory.py"),
-        os.path.join(use_case_root, "src", "test_utils", f"{model_name}_factory.py"),
-        os.path.join(use_case_root, "factories", f"{model_name}_factory.py")
+    # Common factory directories (in order of preference)
+    potential_dirs = [
+        ("tests", "factories"),
+        ("tests",),
+        ("src", "test_utils"),
+        ("factories",)
     ]
+    factory_filename = f"{model_name}_factory.py"
     
-    # Check if any existing factory directory exists
-    for factory_path in potential_locations:
-        factory_dir = os.path.dirname(factory_path)
-        if os.path.exists(factory_dir):
-            return factory_path
+    # Check if any existing factory directory exists (via cached listings)
+    for factory_dir in potential_dirs:
+        if cached_exists(use_case_root, *factory_dir):
+            return os.path.join(use_case_root, *factory_dir, factory_filename)
     
     # Default to tests/factories/ directory
-    return potential_locations[0]
+    return os.path.join(use_case_root, *potential_dirs[0], factory_filename)
 
 
-def extract_models_from_file(file_path: str) -> List[Dict]:
+@lru_cache(maxsize=None)
+def _load_template(name: str) -> str:
+    """
+    Read a template from the templates directory, once per process.
+    
+    Args:
+        name: Template file name
+        
+    Returns:
+        Template content (factory_template.py takes str.format placeholders)
+    """
+    return (TEMPLATES_DIR / name).read_text()
+
+
+def _model_cache_path(file_path: str) -> Path:
+    """Get the cache file holding the parsed models of a source file."""
+    return MODEL_CACHE_DIR / f"{hashlib.sha1(file_path.encode()).hexdigest()}.json"
+
+
+def _load_cached_models(file_path: str, st: os.stat_result) -> Optional[List[Dict]]:
+    """
+    Load cached models for a file if it is unchanged since they were parsed.
+    
+    Args:
+        file_path: Path to the Python file
+        st: Current stat result of the file
+        
+    Returns:
+        Cached model list, or None on a cache miss
+    """
+    try:
+        with open(_model_cache_path(file_path), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if entry.get("version") != MODEL_CACHE_VERSION:
+        return None
+    if entry.get("mtime_ns") != st.st_mtime_ns or entry.get("size") != st.st_size:
+        return None
+    return entry.get("models")
+
+
+def _store_cached_models(file_path: str, st: os.stat_result, models: List[Dict]) -> None:
+    """
+    Cache the parsed models of a file, replacing any stale entry.
+    
+    Args:
+        file_path: Path to the Python file
+        st: Stat result of the file when it was parsed
+        models: Parsed model list
+    """
+    cache_path = _model_cache_path(file_path)
+    try:
+        MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent hooks never read a partial file
+        temp_path = f"{cache_path}.{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MODEL_CACHE_VERSION, "mtime_ns": st.st_mtime_ns,
+                       "size": st.st_size, "models": models}, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # Caching is best-effort
+
+
+def extract_models_from_file(file_path: str, source: Optional[str] = None) -> List[Dict]:
     """
     Extract model information from a Python file.
     
+    Results are cached on disk per file, so repeated hook runs on an
+    unchanged file skip parsing entirely.
+    
     Args:
         file_path: Path to the Python file
+        source: Current content of the file, if already in memory (saves
+            reading it again on a cache miss)
         
     Returns:
         List of model information dictionaries
@@ -120,16 +218,26 @@ def extract_models_from_file(file_path: str) -> List[Dict]:
     models = []
     
     try:
-        parser = ModelParser()
-        parsed_models = parser.parse_file(file_path)
+        st = os.stat(file_path)
+        cached = _load_cached_models(file_path, st)
+        if cached is not None:
+            return cached
+        
+        from utils.factory_generator import ModelParser
+        
+        parser = ModelParser(file_path, source)
+        parsed_models = parser.parse_file()
         
         for model_info in parsed_models:
             models.append({
                 "name": model_info["name"],
                 "fields": model_info["fields"],
                 "base_classes": model_info.get("base_classes", []),
+                "is_sqlalchemy": model_info["is_sqlalchemy"],
                 "file_path": file_path
             })
+        
+        _store_cached_models(file_path, st, models)
     
     except Exception as e:
         print(f"Error parsing models from {file_path}: {str(e)}", file=sys.stderr)
@@ -137,13 +245,15 @@ def extract_models_from_file(file_path: str) -> List[Dict]:
     return models
 
 
-def generate_factory_file(model_file_path: str, factory_file_path: str) -> Dict:
+def generate_factory_file(model_file_path: str, factory_file_path: str,
+                          model_source: Optional[str] = None) -> Dict:
     """
     Generate a Factory Boy factory file for the given model file.
     
     Args:
         model_file_path: Path to the model file
         factory_file_path: Path where the factory file should be created
+        model_source: Current content of the model file, if already known
         
     Returns:
         Dictionary with generation results
@@ -158,7 +268,7 @@ def generate_factory_file(model_file_path: str, factory_file_path: str) -> Dict:
     
     try:
         # Extract models from the file
-        models = extract_models_from_file(model_file_path)
+        models = extract_models_from_file(model_file_path, model_source)
         
         if not models:
             results["errors"].append("No models found in the file")
@@ -175,18 +285,40 @@ def generate_factory_file(model_file_path: str, factory_file_path: str) -> Dict:
         # Ensure the factory directory exists
         ensure_directory_exists(factory_file_path)
         
-        # Generate factory content using the generator
-        generator = FactoryGenerator()
-        
         # For now, generate factory for the first model in the file
         # (In a real implementation, you might want to handle multiple models)
         primary_model = models[0]
         
-        # Generate the factory content
-        factory_content = generator.generate_factory_file_content(
+        # Render the factory from the model's parsed fields; the template
+        # supplies the module header and the FACTORIES registry
+        from utils.factory_generator import FactoryGenerator
+        
+        generator = FactoryGenerator(
+            primary_model,
+            _get_model_import_path(model_file_path, primary_model["name"])
+        )
+        # Only register a factory that can create instances as generated: one
+        # with an empty body would fail on the model's required arguments, and
+        # a SQLAlchemy one has no session until a test fixture binds it
+        if primary_model.get("is_sqlalchemy"):
+            registry = (
+                f"# Register {primary_model['name']}Factory here once its Meta.sqlalchemy_session\n"
+                "# is bound to a test session\n"
+                "FACTORIES = ()"
+            )
+        elif generator.has_field_definitions():
+            registry = f"FACTORIES = ({primary_model['name']}Factory,)"
+        else:
+            registry = (
+                f"# No fields could be derived from {primary_model['name']}; register the\n"
+                "# factory here once it sets the model's required fields\n"
+                "FACTORIES = ()"
+            )
+        factory_content = _load_template("factory_template.py").format(
             model_name=primary_model["name"],
-            model_fields=primary_model["fields"],
-            model_import_path=_get_model_import_path(model_file_path, primary_model["name"])
+            imports=generator.generate_imports(),
+            factory=generator.generate_factory().rstrip(),
+            registry=registry
         )
         
         # Write the factory file
@@ -201,7 +333,7 @@ def generate_factory_file(model_file_path: str, factory_file_path: str) -> Dict:
         init_file = os.path.join(factory_dir, "__init__.py")
         if not os.path.exists(init_file):
             with open(init_file, 'w') as f:
-                f.write('"""Factory Boy factories for test data generation."""\n')
+                f.write(_load_template("factory_init_template.py"))
         
     except Exception as e:
         results["errors"].append(f"Error generating factory: {str(e)}")
@@ -221,18 +353,15 @@ def _get_model_import_path(model_file_path: str, model_name: str) -> str:
         Import path string
     """
     try:
-        use_case_root = get_use_case_root()
-        relative_path = get_relative_path(model_file_path, use_case_root)
+        # Module path components relative to the use-case root, without .py
+        parts = Path(model_file_path).relative_to(get_use_case_root()).with_suffix('').parts
         
         # Remove src/ prefix if present
-        if relative_path.startswith('src/'):
-            relative_path = relative_path[4:]
-        
-        # Convert path to import format
-        import_path = relative_path.replace('/', '.').replace('.py', '')
+        if parts[:1] == ('src',):
+            parts = parts[1:]
         
         # Add src prefix for imports
-        return f"src.{import_path}"
+        return "src." + ".".join(parts)
     
     except Exception:
         # Fallback
@@ -294,39 +423,7 @@ def update_conftest_py(factory_file_path: str) -> None:
         
         # Create conftest.py if it doesn't exist
         if not os.path.exists(conftest_path):
-            conftest_content = '''"""
-Test configuration and fixtures.
-
-This file contains pytest fixtures and configuration for the test suite.
-"""
-
-import pytest
-import os
-import sqlite3
-from pathlib import Path
-
-# Test database fixture
-@pytest.fixture
-def test_db():
-    """Provide a clean test database for each test."""
-    db_path = "tests/test_data.db"
-    
-    # Remove existing database
-    if os.path.exists(db_path):
-        os.remove(db_path)
-    
-    # Create new database
-    # Add your schema creation logic here
-    
-    yield db_path
-    
-    # Cleanup
-    if os.path.exists(db_path):
-        os.remove(db_path)
-
-
-# Add more fixtures as needed
-'''
+            conftest_content = _load_template("conftest_template.py")
             
             ensure_directory_exists(conftest_path)
             with open(conftest_path, 'w') as f:
@@ -336,33 +433,27 @@ def test_db():
         print(f"Warning: Could not update conftest.py: {str(e)}", file=sys.stderr)
 
 
-def main():
+def handle_request(input_data: Union[bytes, str]) -> str:
     """
-    Main hook function called by Claude Code.
+    Process a single hook request and build the JSON response.
     
-    Expected input format (from stdin):
-    {
-        "tool": "Write" | "Edit",
-        "path": "/path/to/file.py",
-        "content": "file content...",
-        "arguments": {...}
-    }
+    Args:
+        input_data: Raw hook input (JSON document from Claude Code)
+        
+    Returns:
+        Serialized JSON response for Claude Code
     """
     try:
-        # Read input from stdin
-        input_data = sys.stdin.read().strip()
-        if not input_data:
+        if not input_data.strip():
             # No input, allow operation to continue
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
         
         # Parse the input
         try:
-            data = json.loads(input_data)
+            data = loads(input_data)
         except json.JSONDecodeError:
             # Invalid JSON, allow operation to continue
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
         
         # Extract file path and tool
         file_path = data.get("path", "")
@@ -370,14 +461,18 @@ def main():
         
         # Check if we should generate a factory
         if not should_generate_factory(file_path, tool):
-            print(json.dumps({"action": "continue"}))
-            return
+            return _CONTINUE
+        
+        # Directory listings are only valid for one request (the daemon
+        # serves many, and files appear in between)
+        list_directory.cache_clear()
         
         # Determine factory file path
         factory_file_path = get_factory_file_path(file_path)
         
-        # Generate the factory
-        results = generate_factory_file(file_path, factory_file_path)
+        # Generate the factory (a Write payload carries the whole new file)
+        source = data.get("content") if tool == "Write" else None
+        results = generate_factory_file(file_path, factory_file_path, source)
         
         # Update conftest.py if factory was created successfully
         if results["success"]:
@@ -387,19 +482,52 @@ def main():
         feedback_message = generate_feedback_message(results, file_path)
         
         # Always continue (don't block the operation)
-        print(json.dumps({
+        return dumps({
             "action": "continue",
             "message": feedback_message
-        }))
+        })
     
     except Exception as e:
         # Handle any unexpected errors gracefully
         error_message = f"⚠️ Factory generation hook error: {str(e)}. Continuing with operation."
-        print(json.dumps({
+        return dumps({
             "action": "continue",
             "message": error_message
-        }))
+        })
+
+
+def main():
+    """
+    Main hook function called by Claude Code.
+    
+    Forwards the request to the warm hooks daemon when available and falls
+    back to processing it in this process otherwise.
+    
+    Expected input format (from stdin):
+    {
+        "tool": "Write" | "Edit",
+        "path": "/path/to/file.py",
+        "content": "file content...",
+        "arguments": {...}
+    }
+    """
+    # Bytes: orjson parses them without decoding
+    input_data = sys.stdin.buffer.read()
+    
+    # Reject empty input and most payloads without parsing them (and their
+    # possibly large content) or contacting the daemon: a target needs a JSON
+    # string ending in .py and a Write or Edit tool; escaped quotes inside
+    # content can never match these
+    if not input_data.strip() or not _might_need_factory(input_data):
+        sys.stdout.write(_CONTINUE + "\n")
+        return
+    
+    response = forward_to_daemon("generate_factory", input_data)
+    if response is None:
+        response = handle_request(input_data)
+    
+    print(response)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Hooks Daemon
+
+Long-running server that keeps hook modules imported and their caches warm.
+Hooks act as thin clients: they forward their stdin payload over a Unix domain
+socket and print the daemon's response, so only the first edit of a session
+pays for interpreter start-up, imports and cold caches.
+
+The daemon is started lazily by the first hook invocation and exits on its own
+after an idle timeout or when a hook source file changes. Set
+CLAUDE_HOOKS_DAEMON=0 to disable it and always process hooks in-process.
+
+Protocol: the client sends "<hook_name>\\n<stdin payload>", shuts down its
+write side and reads the JSON response until EOF. An empty response means the
+daemon could not serve the request and the client should handle it locally.
+
+The socket lives in a directory only the user can access ($XDG_RUNTIME_DIR,
+or a 0700 directory of their own under the temp dir), and the client checks
+that the listening process runs as the same user before sending anything.
+Each connection is served on its own thread; requests for the same hook are
+serialized, since hook modules keep unsynchronized caches.
+"""
+
+import os
+import sys
+import stat
+import socket
+import struct
+import zlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+hooks_dir = Path(__file__).parent
+
+# Every hook imports this module before forwarding its request, so anything
+# only the daemon itself needs (subprocess, importlib, ...) is imported lazily
+
+# Environment variables hooks resolve tools with; the daemon keeps those of
+# the hook that started it, so hooks with other values need another daemon
+ENVIRONMENT_KEYS = ("PATH", "VIRTUAL_ENV")
+
+# Seconds without requests before the daemon shuts itself down
+IDLE_TIMEOUT = 600
+
+# Seconds a client waits for the daemon to answer before giving up
+REQUEST_TIMEOUT = 120
+
+# Hook modules served by the daemon; each exposes handle_request(str) -> str
+# and may expose warm_up() to preload its caches when the daemon starts.
+# prepare_test_db is not served: it imports and runs project code (factories,
+# schema setup) whose module state must not outlive a single pytest run
+SERVED_HOOKS = (
+    "check_duplication",
+    "ensure_test_file",
+    "format_and_lint",
+    "generate_factory",
+)
+
+
+def daemon_enabled() -> bool:
+    """
+    Check whether hooks should be forwarded to the daemon.
+
+    Returns:
+        True unless disabled via CLAUDE_HOOKS_DAEMON=0 or unsupported platform
+    """
+    return hasattr(socket, "AF_UNIX") and os.environ.get("CLAUDE_HOOKS_DAEMON", "1") != "0"
+
+
+def private_runtime_dir() -> Optional[str]:
+    """
+    Get the user's private hooks directory, creating it if needed.
+
+    It holds the daemon socket and any state hooks share between runs that
+    other local users must not be able to read or plant (queues, results,
+    caches that suppress feedback).
+
+    Returns:
+        Directory owned by the current user and inaccessible to anyone else,
+        or None if no such directory can be set up (the daemon and the
+        shared state are then not used)
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isabs(runtime_dir):
+        directory = os.path.join(runtime_dir, "claude_hooks")
+    else:
+        import tempfile
+        directory = os.path.join(tempfile.gettempdir(), f"claude_hooks-{os.getuid()}")
+
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+
+    # Someone else may have created it first (e.g. in a shared /tmp)
+    try:
+        st = os.lstat(directory)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        return None
+    return directory
+
+
+def _socket_name() -> str:
+    """
+    Get the daemon socket file name.
+
+    There is one daemon per hooks checkout, project and environment (and per
+    user): hooks resolve and memoize the project root from the daemon's
+    working directory, so a project that calls another checkout's hooks by
+    absolute path must not share that project's daemon; and they find tools
+    such as ruff through the daemon's PATH and virtualenv, so activating
+    another virtualenv must not keep using the old one's tools.
+
+    Returns:
+        Socket file name derived from the hooks directory, project root and
+        tool lookup environment
+    """
+    from utils.file_utils import get_project_root
+
+    environment = [os.environ.get(name, "") for name in ENVIRONMENT_KEYS]
+    key = "\0".join([str(hooks_dir.resolve()), get_project_root(), *environment])
+    return f"{zlib.crc32(key.encode()):08x}.sock"
+
+
+def _socket_path() -> Optional[str]:
+    """Get the daemon socket path, or None if there is no private directory for it."""
+    directory = private_runtime_dir()
+    return os.path.join(directory, _socket_name()) if directory else None
+
+
+def _peer_uid(conn: socket.socket) -> Optional[int]:
+    """
+    Get the user id of the process on the other end of a Unix socket.
+
+    Returns:
+        Peer uid, or None where SO_PEERCRED is not available
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+def _recv_all(conn: socket.socket) -> bytes:
+    """Read from a socket until the peer closes its write side."""
+    chunks = []
+    while chunk := conn.recv(65536):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def start_daemon() -> None:
+    """Launch the daemon in the background, detached from the calling hook."""
+    import subprocess
+
+    try:
+        subprocess.Popen(
+            [sys.executable, str(hooks_dir / "hooks_daemon.py")],
+            cwd=os.getcwd(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    except Exception:
+        pass  # The hook still works in-process
+
+
+def forward_to_daemon(hook_name: str, input_data: Union[bytes, str]) -> Optional[str]:
+    """
+    Forward a hook request to the daemon.
+
+    Starts the daemon in the background if it is not running yet, so that
+    subsequent hook invocations can use it.
+
+    Args:
+        hook_name: Name of the hook module (e.g. "check_duplication")
+        input_data: Raw stdin payload received by the hook (bytes or str)
+
+    Returns:
+        JSON response string, or None if the request must be handled locally
+    """
+    if not daemon_enabled():
+        return None
+
+    socket_path = _socket_path()
+    if socket_path is None:
+        return None
+
+    if isinstance(input_data, str):
+        input_data = input_data.encode()
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(REQUEST_TIMEOUT)
+            client.connect(socket_path)
+            # Never hand file contents to (or take a response from) another user
+            peer_uid = _peer_uid(client)
+            if peer_uid is not None and peer_uid != os.getuid():
+                return None
+            client.sendall(hook_name.encode() + b"\n" + input_data)
+            client.shutdown(socket.SHUT_WR)
+            response = _recv_all(client).decode()
+    except (ConnectionRefusedError, FileNotFoundError):
+        start_daemon()
+        return None
+    except OSError:
+        return None
+
+    return response or None
+
+
+def _source_mtimes() -> Dict[str, int]:
+    """Snapshot modification times of the hook sources and templates served by the daemon."""
+    mtimes = {}
+    for path in [*hooks_dir.glob("*.py"), *(hooks_dir / "utils").glob("*.py"), *(hooks_dir / "templates").glob("*.py")]:
+        try:
+            mtimes[str(path)] = path.stat().st_mtime_ns
+        except OSError:
+            continue
+    return mtimes
+
+
+def _inode(path: str) -> Optional[Tuple[int, int]]:
+    """Get the (device, inode) identifying a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _bind_server(socket_path: str) -> Optional[socket.socket]:
+    """
+    Bind the daemon socket, replacing a stale socket file if necessary.
+
+    Args:
+        socket_path: Socket path inside the user's private socket directory
+
+    Returns:
+        Listening socket, or None if another daemon already serves requests
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Create the socket file as 0600 from the start (the directory is private
+    # anyway; this also covers a directory whose mode is later loosened)
+    old_umask = os.umask(0o177)
+    try:
+        try:
+            server.bind(socket_path)
+        except OSError:
+            # Socket file exists - check whether a live daemon owns it
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(socket_path)
+                server.close()
+                return None
+            except OSError:
+                os.unlink(socket_path)
+                server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+
+    server.listen()
+    server.settimeout(IDLE_TIMEOUT)
+    return server
+
+
+def _serve_connection(conn: socket.socket, handlers: Dict[str, Callable[[str], str]],
+                      locks: Dict[str, threading.Lock]) -> None:
+    """
+    Answer one client request (run on its own thread).
+
+    Any failure leaves the response empty, so the client falls back to
+    handling the hook in-process.
+    """
+    with conn:
+        conn.settimeout(REQUEST_TIMEOUT)
+        try:
+            request = _recv_all(conn)
+            hook_name, _, payload = request.partition(b"\n")
+            name = hook_name.decode()
+            handler = handlers.get(name)
+            if handler is None:
+                return
+
+            with locks[name]:
+                response = handler(payload.decode())
+            conn.sendall(response.encode())
+        except Exception:
+            pass
+
+
+def _warm_up(modules: Dict[str, object], locks: Dict[str, threading.Lock]) -> None:
+    """
+    Preload the caches of the served hooks (run on its own thread).
+
+    Each hook warms up under its request lock, so its first request waits
+    for the warm-up instead of racing it on the hook's unsynchronized caches.
+    """
+    for name, module in modules.items():
+        warm_up = getattr(module, "warm_up", None)
+        if warm_up is None:
+            continue
+        with locks[name]:
+            try:
+                warm_up()
+            except Exception:
+                pass  # Caches fill on demand instead
+
+
+def serve() -> None:
+    """Serve hook requests until idle for IDLE_TIMEOUT or hook sources change."""
+    import importlib
+
+    if str(hooks_dir) not in sys.path:
+        sys.path.insert(0, str(hooks_dir))
+
+    # Keep a ruff language server alive for as long as the daemon runs
+    from utils.ruff_client import enable_persistent_server, reset_ruff_client
+    enable_persistent_server()
+
+    # Connections are served on threads, so nothing may fork worker processes
+    from utils.duplication_detector import disable_process_pool
+    disable_process_pool()
+
+    modules = [importlib.import_module(name) for name in SERVED_HOOKS]
+    handlers: Dict[str, Callable[[str], str]] = {
+        name: module.handle_request for name, module in zip(SERVED_HOOKS, modules)
+    }
+
+    socket_path = _socket_path()
+    if socket_path is None:
+        return
+
+    server = _bind_server(socket_path)
+    if server is None:
+        return
+    bound = _inode(socket_path)
+
+    mtimes = _source_mtimes()
+    locks = {name: threading.Lock() for name in handlers}
+    workers: List[threading.Thread] = []
+
+    # Warm caches once bound, alongside the accept loop: only requests for
+    # a hook that is still warming up wait for it
+    warmer = threading.Thread(target=_warm_up, args=(dict(zip(SERVED_HOOKS, modules)), locks))
+    warmer.start()
+    workers.append(warmer)
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+
+            # Stale code: reply empty so the client handles it and restarts us
+            if _source_mtimes() != mtimes:
+                conn.close()
+                break
+
+            # Parallel hooks of one tool call must not queue behind each other
+            worker = threading.Thread(target=_serve_connection, args=(conn, handlers, locks))
+            worker.start()
+            workers = [w for w in workers if w.is_alive()]
+            workers.append(worker)
+    finally:
+        # Remove the socket file while still listening, so no other daemon
+        # can have replaced it yet (a live socket is never replaced), and
+        # only if it is still ours
+        if bound is not None and _inode(socket_path) == bound:
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
+        server.close()
+        # Let in-flight requests finish before stopping the ruff server
+        for worker in workers:
+            worker.join()
+        reset_ruff_client()
+
+
+if __name__ == "__main__":
+    serve()
@@ -11,28 +11,50 @@ Trigger: Before Bash commands containing "pytest"
 """
 
 import os
+import re
 import json
 import sys
-import sqlite3
-import importlib
-import inspect
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-# Add hooks utils to path
+# Add hooks utils to path (already there when the hook runs as a script)
 hooks_dir = Path(__file__).parent
-sys.path.insert(0, str(hooks_dir))
+if str(hooks_dir) not in sys.path:
+    sys.path.insert(0, str(hooks_dir))
 
+from utils.json_utils import dumps, loads
 from utils.file_utils import (
     get_use_case_root,
+    cached_exists,
+    list_directory,
     find_python_files,
     is_model_file
 )
-from utils.factory_generator import (
-    FactoryGenerator,
-    ModelParser
+
+# sqlite3, importlib, inspect and utils.factory_generator are imported inside
+# the functions that use them, so non-pytest Bash commands skip their cost
+
+# Pre-serialized response for the common "nothing to do" path
+_CONTINUE = '{"action": "continue"}'
+
+_PYTEST_RE = re.compile(r'\bpytest\b', re.IGNORECASE)
+
+# The test database is rebuilt before every pytest run, so durability is
+# worthless: keep the journal in memory and never fsync while building it
+_TEST_DB_PRAGMAS = (
+    "PRAGMA journal_mode=MEMORY;"
+    "PRAGMA synchronous=OFF;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-65536;"
 )
 
+# Threads reading source files when looking for models (I/O bound)
+MODEL_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Instances created per factory when populating the test database
+INSTANCES_PER_FACTORY = 3
+
 
 def should_prepare_database(command: str) -> bool:
     """
@@ -44,25 +66,17 @@ def should_prepare_database(command: str) -> bool:
     Returns:
         True if database preparation is needed
     """
-    # Check if this is a pytest command
-    if "pytest" not in command.lower():
+    # Check if this is a pytest command (no lowercased copy of the command)
+    if not _PYTEST_RE.search(command):
         return False
     
     # Skip if running hooks themselves
     if ".claude/hooks" in command:
         return False
     
-    # Check if we have a use-case project
-    use_case_root = get_use_case_root()
-    if not os.path.exists(use_case_root):
-        return False
-    
-    # Check if we have src directory with Python files
-    src_dir = os.path.join(use_case_root, "src")
-    if not os.path.exists(src_dir):
-        return False
-    
-    return True
+    # Check if we have a use-case project with a src directory (an empty
+    # listing of a missing use-case root also fails this)
+    return cached_exists(get_use_case_root(), "src")
 
 
 def get_test_database_path() -> str:
@@ -93,6 +107,7 @@ def clear_test_database(db_path: str) -> bool:
         # Ensure the tests directory exists
         db_dir = os.path.dirname(db_path)
         os.makedirs(db_dir, exist_ok=True)
+        list_directory.cache_clear()  # Later probes must see the changes
         
         return True
     except Exception as e:
@@ -100,6 +115,23 @@ def clear_test_database(db_path: str) -> bool:
         return False
 
 
+def _connect_test_database(db_path: str):
+    """
+    Open the test database configured for throughput over durability.
+    
+    Args:
+        db_path: Path to the database file
+        
+    Returns:
+        sqlite3 connection; the caller closes it
+    """
+    import sqlite3
+    
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_TEST_DB_PRAGMAS)
+    return conn
+
+
 def create_test_database_schema(db_path: str) -> bool:
     """
     Create the test database schema if needed.
@@ -110,24 +142,30 @@ def create_test_database_schema(db_path: str) -> bool:
     Returns:
         True if successful
     """
+    import importlib
+    import inspect
+    from contextlib import closing
+    
     try:
         use_case_root = get_use_case_root()
         
         # Look for database initialization files
         potential_schema_files = [
-            os.path.join(use_case_root, "src", "database.py"),
-            os.path.join(use_case_root, "src", "models.py"),
-            os.path.join(use_case_root, "src", "db.py"),
-            os.path.join(use_case_root, "schema.sql"),
-            os.path.join(use_case_root, "tests", "schema.sql")
+            ("src", "database.py"),
+            ("src", "models.py"),
+            ("src", "db.py"),
+            ("schema.sql",),
+            ("tests", "schema.sql")
         ]
         
-        # Try to find and execute schema initialization
-        for schema_file in potential_schema_files:
-            if os.path.exists(schema_file):
+        # Try to find and execute schema initialization (one cached scandir
+        # per directory instead of a stat per candidate)
+        for schema_parts in potential_schema_files:
+            if cached_exists(use_case_root, *schema_parts):
+                schema_file = os.path.join(use_case_root, *schema_parts)
                 if schema_file.endswith('.sql'):
                     # Execute SQL schema file
-                    with sqlite3.connect(db_path) as conn:
+                    with closing(_connect_test_database(db_path)) as conn, conn:
                         with open(schema_file, 'r') as f:
                             conn.executescript(f.read())
                     return True
@@ -165,7 +203,7 @@ def create_test_database_schema(db_path: str) -> bool:
                         continue
         
         # If no schema file found, create a minimal database
-        with sqlite3.connect(db_path) as conn:
+        with closing(_connect_test_database(db_path)) as conn, conn:
             # Create a basic table structure for testing
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS test_data (
@@ -193,22 +231,152 @@ def find_factory_files() -> List[str]:
     use_case_root = get_use_case_root()
     factory_files = []
     
-    # Common locations for factory files
+    # Common locations for factory files (tests/ also covers tests/factories/,
+    # so no directory is walked twice)
     potential_dirs = [
-        os.path.join(use_case_root, "tests", "factories"),
-        os.path.join(use_case_root, "tests"),
-        os.path.join(use_case_root, "src", "test_utils"),
-        os.path.join(use_case_root, "factories")
+        ("tests",),
+        ("src", "test_utils"),
+        ("factories",)
     ]
     
-    for directory in potential_dirs:
-        if os.path.exists(directory):
+    for dir_parts in potential_dirs:
+        if cached_exists(use_case_root, *dir_parts):
+            directory = os.path.join(use_case_root, *dir_parts)
             python_files = find_python_files(directory, pattern="*factory*.py")
             factory_files.extend(python_files)
     
     return factory_files
 
 
+def _factory_module_name(factory_file: str, use_case_root: str) -> str:
+    """
+    Get the module name a factory file is importable as.
+    
+    Args:
+        factory_file: Path to the factory file
+        use_case_root: Use-case root directory
+        
+    Returns:
+        Dotted module name relative to the src/ or tests/ directory
+    """
+    relative_path = os.path.relpath(factory_file, use_case_root)
+    module_name = relative_path.replace('/', '.').replace('.py', '')
+    
+    # Remove common prefixes
+    if module_name.startswith('tests.'):
+        module_name = module_name[6:]
+    if module_name.startswith('src.'):
+        module_name = module_name[4:]
+    
+    return module_name
+
+
+def _module_factories(factory_module: Any) -> List[Tuple[str, Any]]:
+    """
+    Get the factory classes to populate the test database from.
+    
+    Generated factory modules list them in a FACTORIES tuple, left empty when
+    the generator could not derive any of the model's fields; other modules
+    are scanned for classes named *Factory that have a create() method.
+    
+    Args:
+        factory_module: Imported factory module
+        
+    Returns:
+        List of (name, factory class) pairs
+    """
+    factories = getattr(factory_module, "FACTORIES", None)
+    if factories is not None:
+        return [(factory.__name__, factory) for factory in factories]
+    
+    return [
+        (name, obj) for name, obj in vars(factory_module).items()
+        if isinstance(obj, type) and name.endswith('Factory') and hasattr(obj, 'create')
+    ]
+
+
+def _needs_create(meta: Any) -> bool:
+    """
+    Check whether a SQLAlchemy factory must save its instances via create().
+    
+    build_batch skips SQLAlchemyModelFactory._create, which implements
+    Meta.sqlalchemy_get_or_create, and runs post-generation declarations
+    with create=False, which they commonly treat as "do nothing".
+    
+    Args:
+        meta: Factory options (factory_class._meta)
+        
+    Returns:
+        True if the factory uses get-or-create or declares post-generation hooks
+    """
+    if getattr(meta, "sqlalchemy_get_or_create", None):
+        return True
+    
+    post_declarations = getattr(meta, "post_declarations", None)
+    as_dict = getattr(post_declarations, "as_dict", None)
+    return bool(as_dict()) if as_dict is not None else False
+
+
+def _create_instances(factory_class: Any, count: int, pending: Dict[int, Tuple[Any, List]]) -> int:
+    """
+    Create instances of a factory in as few round trips as possible.
+    
+    Plain SQLAlchemy factories only build their batch here: the instances
+    are queued in pending per session, for _save_pending to add and commit
+    together with those of every other factory. Factories that rely on
+    create() itself (sqlalchemy_get_or_create lookups, post-generation
+    hooks that only run on create) and other Factory Boy factories use
+    create_batch, and anything else with a create() method is called once
+    per instance.
+    
+    Args:
+        factory_class: Factory class
+        count: Number of instances to create
+        pending: Session id -> (session, built instances awaiting commit)
+        
+    Returns:
+        Number of instances created; queued instances are counted by
+        _save_pending once their commit succeeds
+    """
+    meta = getattr(factory_class, "_meta", None)
+    session = getattr(meta, "sqlalchemy_session", None)
+    if session is not None and hasattr(factory_class, "build_batch") and not _needs_create(meta):
+        instances = factory_class.build_batch(count)
+        pending.setdefault(id(session), (session, []))[1].extend(instances)
+        return 0
+    
+    if hasattr(factory_class, "create_batch"):
+        return len(factory_class.create_batch(count))
+    
+    for _ in range(count):
+        factory_class.create()
+    return count
+
+
+def _save_pending(pending: Dict[int, Tuple[Any, List]], results: Dict) -> None:
+    """
+    Save queued factory instances with one commit per session.
+    
+    Args:
+        pending: Session id -> (session, built instances awaiting commit)
+        results: Population results; committed instances are added to
+            data_created and failed saves are reported in errors
+    """
+    for session, instances in pending.values():
+        try:
+            session.add_all(instances)
+            session.commit()
+        except Exception as e:
+            results["errors"].append(f"Error saving factory data: {str(e)}")
+            # A broken session must not keep the other sessions from saving
+            try:
+                session.rollback()
+            except Exception as rollback_error:
+                results["errors"].append(f"Error rolling back factory data: {str(rollback_error)}")
+            continue
+        results["data_created"] += len(instances)
+
+
 def populate_test_data(db_path: str) -> Dict:
     """
     Populate the test database with Factory Boy data.
@@ -219,6 +387,8 @@ def populate_test_data(db_path: str) -> Dict:
     Returns:
         Dictionary with population results
     """
+    import importlib
+    
     results = {
         "factories_found": 0,
         "data_created": 0,
@@ -243,53 +413,47 @@ def populate_test_data(db_path: str) -> Dict:
             # If no factories exist, generate them automatically
             model_files = []
             if os.path.exists(src_dir):
-                model_files = [f for f in find_python_files(src_dir) if is_model_file(f)]
+                # is_model_file reads each candidate; overlap the reads
+                source_files = find_python_files(src_dir)
+                with ThreadPoolExecutor(max_workers=MODEL_SCAN_WORKERS) as executor:
+                    model_files = [
+                        f for f, is_model in zip(source_files, executor.map(is_model_file, source_files))
+                        if is_model
+                    ]
             
             if model_files:
-                generator = FactoryGenerator()
+                from utils.factory_generator import generate_factory_file
+                
                 for model_file in model_files[:3]:  # Limit to first 3 models
-                    try:
-                        generator.generate_factory_for_file(model_file)
+                    if generate_factory_file(model_file):
                         results["factories_found"] += 1
-                    except Exception as e:
-                        results["errors"].append(f"Error generating factory for {model_file}: {str(e)}")
+                    else:
+                        results["errors"].append(f"Error generating factory for {model_file}")
             
             return results
         
-        # Import and use existing factories
+        # Import factory modules one at a time: they share model imports,
+        # which concurrent imports could see half-initialized
+        pending = {}
         for factory_file in factory_files:
             try:
-                # Get module name from file path
-                relative_path = os.path.relpath(factory_file, use_case_root)
-                module_name = relative_path.replace('/', '.').replace('.py', '')
-                
-                # Remove common prefixes
-                if module_name.startswith('tests.'):
-                    module_name = module_name[6:]
-                if module_name.startswith('src.'):
-                    module_name = module_name[4:]
-                
-                # Import the factory module
-                factory_module = importlib.import_module(module_name)
+                factory_module = importlib.import_module(_factory_module_name(factory_file, use_case_root))
                 results["factories_found"] += 1
                 
-                # Find factory classes in the module
-                for name, obj in inspect.getmembers(factory_module):
-                    if (inspect.isclass(obj) and 
-                        name.endswith('Factory') and 
-                        hasattr(obj, 'create')):
-                        
-                        try:
-                            # Create a few instances using the factory
-                            for _ in range(3):  # Create 3 instances per factory
-                                obj.create()
-                                results["data_created"] += 1
-                        except Exception as e:
-                            results["errors"].append(f"Error creating data with {name}: {str(e)}")
-                            
+                # Find factory classes in the module; SQLAlchemy instances
+                # are saved at the end
+                for name, obj in _module_factories(factory_module):
+                    try:
+                        # Create a few instances using the factory
+                        results["data_created"] += _create_instances(obj, INSTANCES_PER_FACTORY, pending)
+                    except Exception as e:
+                        results["errors"].append(f"Error creating data with {name}: {str(e)}")
+                
             except Exception as e:
                 results["errors"].append(f"Error importing factory file {factory_file}: {str(e)}")
         
+        _save_pending(pending, results)
+        
         return results
         
     except Exception as e:
@@ -418,19 +582,20 @@ def main():
     }
     """
     try:
-        # Read input from stdin
-        input_data = sys.stdin.read().strip()
-        if not input_data:
+        # Read input from stdin (bytes: orjson parses them without decoding,
+        # and both parsers skip surrounding whitespace, so only test for it)
+        input_data = sys.stdin.buffer.read()
+        if not input_data.strip():
             # No input, allow operation to continue
-            print(json.dumps({"action": "continue"}))
+            sys.stdout.write(_CONTINUE + "\n")
             return
         
         # Parse the input
         try:
-            data = json.loads(input_data)
+            data = loads(input_data)
         except json.JSONDecodeError:
             # Invalid JSON, allow operation to continue
-            print(json.dumps({"action": "continue"}))
+            sys.stdout.write(_CONTINUE + "\n")
             return
         
         # Extract command from bash tool
@@ -440,7 +605,7 @@ def main():
         
         # Check if we should prepare the database
         if not should_prepare_database(command):
-            print(json.dumps({"action": "continue"}))
+            sys.stdout.write(_CONTINUE + "\n")
             return
         
         # Prepare the test database
@@ -450,7 +615,7 @@ def main():
         feedback_message = generate_feedback_message(results)
         
         # Always continue (don't block test execution even if preparation fails)
-        print(json.dumps({
+        print(dumps({
             "action": "continue",
             "message": feedback_message
         }))
@@ -458,7 +623,7 @@ def main():
     except Exception as e:
         # Handle any unexpected errors gracefully
         error_message = f"⚠️ Database preparation hook error: {str(e)}. Continuing with test execution."
-        print(json.dumps({
+        print(dumps({
             "action": "continue",
             "message": error_message
         }))
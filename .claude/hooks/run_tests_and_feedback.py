@@ -12,11 +12,19 @@ Trigger: After Claude finishes a development task
 import os
 import json
 import sys
+import time
+import hashlib
 from pathlib import Path
 
-# Add hooks utils to path
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Add hooks utils to path (already there when the hook runs as a script)
 hooks_dir = Path(__file__).parent
-sys.path.insert(0, str(hooks_dir))
+if str(hooks_dir) not in sys.path:
+    sys.path.insert(0, str(hooks_dir))
 
 from utils.test_utils import (
     run_pytest_and_capture,
@@ -25,8 +33,17 @@ from utils.test_utils import (
 )
 from utils.file_utils import (
     get_use_case_root,
+    contains_python_file,
     find_python_files
 )
+from hooks_daemon import private_runtime_dir
+
+# Lock and last results per use-case root, shared by concurrent Stop hooks;
+# kept in this directory under the user's private hooks directory
+TEST_RUN_DIR_NAME = "test_runs"
+
+# pytest configuration files in the use-case root that affect test results
+_PYTEST_CONFIG_FILES = ("conftest.py", "pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini")
 
 
 def should_run_tests() -> bool:
@@ -38,29 +55,94 @@ def should_run_tests() -> bool:
     """
     use_case_root = get_use_case_root()
     
-    # Check if use-case directory exists
-    if not os.path.exists(use_case_root):
-        return False
+    # Tests run only with Python files in src/ and test files in tests/;
+    # a missing use-case, src or tests directory simply contains no files
+    return (contains_python_file(os.path.join(use_case_root, "src")) and
+            contains_python_file(os.path.join(use_case_root, "tests"), "test_"))
+
+
+def _tree_state(use_case_root: str) -> str:
+    """
+    Fingerprint the files a test run depends on.
+    
+    Args:
+        use_case_root: Path to the use-case directory
+        
+    Returns:
+        Digest of the path, mtime and size of every Python file in src/ and
+        tests/ and of the pytest configuration files
+    """
+    paths = sorted(
+        find_python_files(os.path.join(use_case_root, "src")) +
+        find_python_files(os.path.join(use_case_root, "tests"))
+    )
+    paths.extend(os.path.join(use_case_root, name) for name in _PYTEST_CONFIG_FILES)
+    
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return digest.hexdigest()
+
+
+def run_tests() -> dict:
+    """
+    Run the test suite, sharing one pytest session between concurrent hooks.
     
-    # Check if there are any Python files in src/
-    src_dir = os.path.join(use_case_root, "src")
-    if not os.path.exists(src_dir):
-        return False
+    Runs are serialized with a lock per use-case directory. A hook that was
+    already waiting for the lock while another run was in progress reuses
+    that run's results, provided its source, test and configuration files
+    are unchanged, instead of starting pytest again. Results are never
+    reused across separate Stop events: _tree_state does not cover every
+    input of a test run (data files, installed packages).
     
-    python_files = find_python_files(src_dir)
-    if not python_files:
-        return False
+    Returns:
+        Parsed test results
+    """
+    private_dir = private_runtime_dir()
+    if fcntl is None or private_dir is None:
+        return parse_test_results(run_pytest_and_capture(coverage=True))
     
-    # Check if there are any test files
-    tests_dir = os.path.join(use_case_root, "tests")
-    if not os.path.exists(tests_dir):
-        return False
+    use_case_root = get_use_case_root()
+    run_name = hashlib.sha1(use_case_root.encode()).hexdigest()[:12]
+    run_dir = os.path.join(private_dir, TEST_RUN_DIR_NAME)
+    results_file = os.path.join(run_dir, f"{run_name}.json")
     
-    test_files = find_python_files(tests_dir, "test_*.py")
-    if not test_files:
-        return False
+    try:
+        os.makedirs(run_dir, exist_ok=True)
+        lock = open(os.path.join(run_dir, f"{run_name}.lock"), 'a')
+    except OSError:
+        return parse_test_results(run_pytest_and_capture(coverage=True))
     
-    return True
+    with lock:
+        waiting_since = time.time()
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        
+        tree_state = _tree_state(use_case_root)
+        try:
+            with open(results_file, 'r') as f:
+                stored = json.load(f)
+            # Only a run that finished while this hook waited for the lock
+            if stored["finished_at"] >= waiting_since and stored["tree_state"] == tree_state:
+                return stored["results"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # No usable results from an earlier run
+        
+        test_results = parse_test_results(run_pytest_and_capture(coverage=True))
+        
+        try:
+            # Write atomically so readers never see a partial file
+            temp_path = f"{results_file}.{os.getpid()}"
+            with open(temp_path, 'w') as f:
+                json.dump({"tree_state": tree_state, "finished_at": time.time(), "results": test_results}, f)
+            os.replace(temp_path, results_file)
+        except OSError:
+            pass  # Sharing results is best-effort
+        
+        return test_results
 
 
 def analyze_test_failures(test_results: dict) -> dict:
@@ -164,50 +246,49 @@ def generate_feedback_message(test_results: dict, analysis: dict) -> str:
     Returns:
         Formatted feedback message
     """
-    lines = []
-    
     # Test summary
     total_tests = test_results["total"]
     passed = test_results["passed"]
     failed = test_results["failed"]
     coverage = test_results.get("coverage_percent", 0)
+    execution_time = test_results.get("execution_time")
     
-    lines.append("🧪 AUTOMATED TEST RESULTS")
-    lines.append("=" * 50)
-    lines.append(f"Tests: {passed} passed, {failed} failed, {total_tests} total")
-    lines.append(f"Coverage: {coverage}% {'✅' if coverage >= 80 else '⚠️'}")
-    
-    if test_results.get("execution_time"):
-        lines.append(f"Execution time: {test_results['execution_time']:.2f}s")
-    
+    lines = [
+        "🧪 AUTOMATED TEST RESULTS",
+        "=" * 50,
+        f"Tests: {passed} passed, {failed} failed, {total_tests} total",
+        f"Coverage: {coverage}% {'✅' if coverage >= 80 else '⚠️'}"
+    ]
+    if execution_time:
+        lines.append(f"Execution time: {execution_time:.2f}s")
     lines.append("")
     
     # TDD guidance
-    if analysis["tdd_guidance"]:
+    tdd_guidance = analysis["tdd_guidance"]
+    if tdd_guidance:
         lines.append("🔄 TDD CYCLE GUIDANCE:")
-        for guidance in analysis["tdd_guidance"]:
-            lines.append(f"  {guidance}")
+        lines.extend([f"  {guidance}" for guidance in tdd_guidance])
         lines.append("")
     
     # Critical issues
-    if analysis["critical_issues"]:
+    critical_issues = analysis["critical_issues"]
+    if critical_issues:
         lines.append("🚨 CRITICAL ISSUES TO ADDRESS:")
-        for issue in analysis["critical_issues"]:
-            lines.append(f"  • {issue}")
+        lines.extend([f"  • {issue}" for issue in critical_issues])
         lines.append("")
     
     # Next steps
-    if analysis["next_steps"]:
+    next_steps = analysis["next_steps"]
+    if next_steps:
         lines.append("📋 NEXT STEPS:")
-        for i, step in enumerate(analysis["next_steps"], 1):
-            lines.append(f"  {i}. {step}")
+        lines.extend([f"  {i}. {step}" for i, step in enumerate(next_steps, 1)])
         lines.append("")
     
     # Recommendations
-    if analysis["recommendations"]:
+    recommendations = analysis["recommendations"]
+    if recommendations:
         lines.append("💡 RECOMMENDATIONS:")
-        for rec in analysis["recommendations"]:
-            lines.append(f"  • {rec}")
+        lines.extend([f"  • {rec}" for rec in recommendations])
         lines.append("")
     
     # Footer
@@ -260,9 +341,8 @@ def main():
             print(json.dumps({"action": "continue"}))
             return
         
-        # Run the tests
-        test_output = run_pytest_and_capture(coverage=True)
-        test_results = parse_test_results(test_output)
+        # Run the tests (or reuse a concurrent hook's run)
+        test_results = run_tests()
         
         # Analyze the results
         analysis = analyze_test_failures(test_results)
@@ -0,0 +1,32 @@
+"""
+Test configuration and fixtures.
+
+This file contains pytest fixtures and configuration for the test suite.
+"""
+
+import pytest
+import os
+import sqlite3
+from pathlib import Path
+
+# Test database fixture
+@pytest.fixture
+def test_db():
+    """Provide a clean test database for each test."""
+    db_path = "tests/test_data.db"
+    
+    # Remove existing database
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    
+    # Create new database
+    # Add your schema creation logic here
+    
+    yield db_path
+    
+    # Cleanup
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+
+# Add more fixtures as needed
@@ -0,0 +1 @@
+"""Factory Boy factories for test data generation."""
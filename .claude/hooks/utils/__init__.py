@@ -3,33 +3,35 @@ Utility modules for Claude Code Hooks
 
 This package contains utility functions for file manipulation, test management,
 factory generation, and code analysis used by the hooks system.
+
+The re-exported names below are resolved on first access: importing any
+submodule (e.g. utils.file_utils) runs this file, and hooks that only need
+file helpers must not pay for test_utils (sqlite3, subprocess, tempfile).
 """
 
-from .file_utils import (
-    get_corresponding_test_file,
-    get_corresponding_source_file,
-    ensure_directory_exists,
-    is_python_file,
-    is_test_file,
-    is_model_file
-)
+import importlib
+
+# Re-exported name -> submodule defining it
+_EXPORTS = {
+    'get_corresponding_test_file': 'file_utils',
+    'get_corresponding_source_file': 'file_utils',
+    'ensure_directory_exists': 'file_utils',
+    'is_python_file': 'file_utils',
+    'is_test_file': 'file_utils',
+    'is_model_file': 'file_utils',
+    'run_pytest_and_capture': 'test_utils',
+    'parse_test_results': 'test_utils',
+    'get_test_coverage': 'test_utils',
+    'clean_test_database': 'test_utils'
+}
+
+__all__ = list(_EXPORTS)
 
-from .test_utils import (
-    run_pytest_and_capture,
-    parse_test_results,
-    get_test_coverage,
-    clean_test_database
-)
 
-__all__ = [
-    'get_corresponding_test_file',
-    'get_corresponding_source_file', 
-    'ensure_directory_exists',
-    'is_python_file',
-    'is_test_file',
-    'is_model_file',
-    'run_pytest_and_capture',
-    'parse_test_results',
-    'get_test_coverage',
-    'clean_test_database'
-]
\ No newline at end of file
+def __getattr__(name):
+    """Import a re-exported name from its submodule on first access."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
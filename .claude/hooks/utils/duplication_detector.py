@@ -8,13 +8,136 @@ for refactoring to maintain DRY principles.
 
 import ast
 import hashlib
+import json
+import math
 import os
 import re
-from collections import defaultdict
+import sys
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Dict, Iterator, List, Set, Tuple, Optional
 
 from .file_utils import find_python_files, get_use_case_root
+from .fingerprint import file_fingerprint, shared_fingerprints
+
+# Normalization patterns, compiled once (CodeBlocks are built by the thousand)
+_COMMENT_RE = re.compile(r'#.*$', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r'["\'].*?["\']')
+
+# Test files, __init__.py, and hook/migration files, matched anywhere in the
+# path (directory separators may be / or \)
+_SKIP_RE = re.compile(r'__init__\.py|test_|conftest\.py|_test\.py|[\\/](?:\.claude[\\/]hooks|migrations|alembic)[\\/]')
+
+# Extracted block spans per file, validated against (mtime_ns, size, min_lines, deep_scan)
+BLOCK_CACHE_DIR = Path.home() / ".cache" / "claude_hooks" / "dup_blocks"
+
+# Definitions reported as blocks, and the node types that can contain them
+_DEFINITION_NODES = (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)
+_STATEMENT_NODES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+# A block span: (start_line, end_line, content)
+Span = Tuple[int, int, str]
+
+# Files to parse before extraction moves to worker processes; below this,
+# process start-up costs more than parallel parsing saves
+MIN_PROCESS_FILES = 8
+
+# Whether span extraction may fork worker processes at all; multi-threaded
+# hosts such as the hooks daemon turn this off
+_process_pool_allowed = True
+
+# File path -> (validation key, definition blocks, statement blocks)
+_BLOCK_CACHE: Dict[str, Tuple[Tuple[int, int, int, bool], List['CodeBlock'], List['CodeBlock']]] = {}
+
+
+def _block_cache_path(file_path: str) -> Path:
+    """Get the cache file holding the block spans of a source file."""
+    return BLOCK_CACHE_DIR / f"{hashlib.sha1(file_path.encode()).hexdigest()}.json"
+
+
+def _load_cached_spans(file_path: str, key: Tuple[int, int, int, bool]) -> Optional[Tuple[List[Span], List[Span]]]:
+    """
+    Load the block spans cached on disk for a file if they are still valid.
+    
+    Args:
+        file_path: Path to the source file
+        key: Current (mtime_ns, size, min_lines, deep_scan) of the file and detector
+        
+    Returns:
+        (definition spans, statement spans), or None on a cache miss
+    """
+    try:
+        with open(_block_cache_path(file_path), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if tuple(entry.get("key", ())) != key:
+        return None
+    return entry["definitions"], entry["statements"]
+
+
+def _store_cached_spans(file_path: str, key: Tuple[int, int, int, bool],
+                        definitions: List[Span], statements: List[Span]) -> None:
+    """
+    Cache the block spans of a file on disk, replacing any stale entry.
+    
+    Args:
+        file_path: Path to the source file
+        key: (mtime_ns, size, min_lines, deep_scan) the spans were extracted with
+        definitions: Function and class spans
+        statements: Consecutive-statement spans
+    """
+    cache_path = _block_cache_path(file_path)
+    try:
+        BLOCK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent hooks never read a partial file
+        temp_path = f"{cache_path}.{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "definitions": definitions, "statements": statements}, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # Caching is best-effort
+
+
+def _iter_definitions(tree: ast.Module) -> Iterator[ast.stmt]:
+    """
+    Yield function and class definitions, nested ones included, in ast.walk
+    order without visiting any expression nodes.
+    """
+    queue = deque(tree.body)
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, _DEFINITION_NODES):
+            yield node
+        queue.extend(
+            child for child in ast.iter_child_nodes(node)
+            if isinstance(child, _STATEMENT_NODES)
+        )
+
+
+def _parallel_map(func, items: List) -> List:
+    """Map an I/O-bound function over items using a thread pool."""
+    if len(items) < 2:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(len(items), os.cpu_count() or 1)) as executor:
+        return list(executor.map(func, items))
+
+
+def disable_process_pool() -> None:
+    """
+    Keep span extraction in this process.
+    
+    The pool forks, and forking while other threads hold locks (stderr, the
+    import lock) can deadlock the child, so multi-threaded hosts must call
+    this first. The hooks daemon does; its block cache is warm anyway.
+    """
+    global _process_pool_allowed
+    _process_pool_allowed = False
 
 
 class CodeBlock:
@@ -26,26 +149,32 @@ class CodeBlock:
         self.start_line = start_line
         self.end_line = end_line
         self.normalized_content = self._normalize_content(content)
+        self.tokens = frozenset(self.normalized_content.split())
         self.hash = self._calculate_hash()
         self.line_count = end_line - start_line + 1
     
     def _normalize_content(self, content: str) -> str:
         """Normalize content for comparison by removing whitespace and comments."""
         # Remove comments
-        content = re.sub(r'#.*$', '', content, flags=re.MULTILINE)
+        content = _COMMENT_RE.sub('', content)
         
         # Remove extra whitespace
-        content = re.sub(r'\s+', ' ', content)
+        content = _WHITESPACE_RE.sub(' ', content)
         content = content.strip()
         
         # Remove string literals for structural comparison
-        content = re.sub(r'["\'].*?["\']', '""', content)
+        content = _STRING_RE.sub('""', content)
         
         return content
     
-    def _calculate_hash(self) -> str:
-        """Calculate a hash of the normalized content."""
-        return hashlib.md5(self.normalized_content.encode()).hexdigest()
+    def _calculate_hash(self) -> int:
+        """
+        Calculate a hash of the normalized content.
+        
+        The hash is only an in-process equality key, never persisted, so the
+        builtin string hash (per-process salted, no encode step) is enough.
+        """
+        return hash(self.normalized_content)
     
     def similarity_score(self, other: 'CodeBlock') -> float:
         """Calculate similarity score with another code block (0.0 to 1.0)."""
@@ -53,27 +182,35 @@ class CodeBlock:
             return 1.0
         
         # Use a simple similarity measure based on common tokens
-        tokens1 = set(self.normalized_content.split())
-        tokens2 = set(other.normalized_content.split())
-        
-        if not tokens1 or not tokens2:
+        if not self.tokens or not other.tokens:
             return 0.0
         
-        intersection = len(tokens1.intersection(tokens2))
-        union = len(tokens1.union(tokens2))
+        intersection = len(self.tokens & other.tokens)
+        union = len(self.tokens) + len(other.tokens) - intersection
         
-        return intersection / union if union > 0 else 0.0
+        return intersection / union
     
     def __repr__(self):
         return f"CodeBlock({self.file_path}:{self.start_line}-{self.end_line})"
 
 
 class DuplicationDetector:
-    """Detects code duplication in Python files."""
+    """
+    Detects code duplication in Python files.
+    
+    By default only function and class definitions are compared. With
+    deep_scan, runs of consecutive statement lines are compared as well:
+    that also catches copy-pasted code outside definitions, but it multiplies
+    the number of blocks (and so the pairs to score) and mostly adds noisy,
+    overlapping windows that resemble each other in formatting only.
+    """
     
-    def __init__(self, min_lines: int = 3, similarity_threshold: float = 0.8):
+    def __init__(self, min_lines: int = 3, similarity_threshold: float = 0.8,
+                 prefilter_min_shared: Optional[int] = None, deep_scan: bool = False):
         self.min_lines = min_lines
         self.similarity_threshold = similarity_threshold
+        self.prefilter_min_shared = prefilter_min_shared
+        self.deep_scan = deep_scan
         self.code_blocks = []
         self.duplications = []
     
@@ -87,20 +224,54 @@ class DuplicationDetector:
         Returns:
             List of duplication reports
         """
+        return self.analyze_files(find_python_files(directory))
+    
+    def analyze_files(self, python_files: List[str]) -> List[Dict]:
+        """
+        Analyze the given Python files for duplications.
+        
+        Args:
+            python_files: Files to analyze
+            
+        Returns:
+            List of duplication reports
+        """
+        self._collect_blocks(python_files)
+        self._find_duplications()
+        return self._generate_report()
+    
+    def _collect_blocks(self, python_files: List[str]) -> Dict[str, List[CodeBlock]]:
+        """
+        Load the blocks of the given Python files into self.code_blocks.
+        
+        Args:
+            python_files: Files to load (test and __init__.py files are skipped)
+            
+        Returns:
+            The function and class blocks of each loaded file
+        """
+        definitions_by_file = {}
         self.code_blocks = []
         self.duplications = []
         
-        python_files = find_python_files(directory)
+        # Skip test files and __init__.py files
+        python_files = [f for f in python_files if not self._should_skip_file(f)]
         
-        for file_path in python_files:
-            # Skip test files and __init__.py files
-            if self._should_skip_file(file_path):
-                continue
-            
-            self._extract_code_blocks(file_path)
+        # Cache lookups are I/O-bound, so fan them out across threads
+        cached = _parallel_map(self._cached_file_blocks, python_files)
         
-        self._find_duplications()
-        return self._generate_report()
+        missing = [file_path for file_path, (key, blocks) in zip(python_files, cached) if blocks is None]
+        extracted = dict(zip(missing, self._extract_spans_parallel(missing)))
+        
+        for file_path, (key, blocks) in zip(python_files, cached):
+            if blocks is None:
+                blocks = self._store_blocks(file_path, key, extracted[file_path])
+            definitions, statements = blocks
+            self.code_blocks.extend(definitions)
+            self.code_blocks.extend(statements)
+            definitions_by_file[file_path] = definitions
+        
+        return definitions_by_file
     
     def analyze_file(self, file_path: str) -> List[Dict]:
         """
@@ -112,84 +283,197 @@ class DuplicationDetector:
         Returns:
             List of duplication reports
         """
-        # First analyze the entire codebase to build a baseline
+        if self._should_skip_file(file_path):
+            return []
+        
+        # Load the blocks of the codebase as a baseline; only pairs involving
+        # the new file are reported, so duplications within the baseline are
+        # never searched for
+        self.code_blocks = []
+        self.duplications = []
+        baseline_definitions = {}
         use_case_root = get_use_case_root()
         src_directory = os.path.join(use_case_root, "src")
         
         if os.path.exists(src_directory):
-            self.analyze_directory(src_directory)
+            python_files = find_python_files(src_directory)
+            if self.prefilter_min_shared is not None:
+                python_files = self._prefilter_candidates(file_path, python_files)
+            baseline_definitions = self._collect_blocks(python_files)
         
-        # Then analyze the specific file
-        if not self._should_skip_file(file_path):
-            file_blocks = self._extract_code_blocks(file_path)
-            
-            # Find duplications involving the new file
-            new_duplications = []
-            for new_block in file_blocks:
-                for existing_block in self.code_blocks:
-                    if (existing_block.file_path != new_block.file_path and
-                        new_block.similarity_score(existing_block) >= self.similarity_threshold):
-                        new_duplications.append({
-                            "block1": new_block,
-                            "block2": existing_block,
-                            "similarity": new_block.similarity_score(existing_block),
-                            "type": "cross_file"
-                        })
-            
-            return self._format_duplications(new_duplications)
+        # Then compare the specific file's definitions against other files
+        # (a file inside src/ was already loaded with the baseline)
+        file_blocks = baseline_definitions.get(file_path)
+        if file_blocks is None:
+            file_blocks, _ = self._file_blocks(file_path)
         
-        return []
+        new_duplications = []
+        for new_block in file_blocks:
+            for existing_block in self.code_blocks:
+                if (existing_block.file_path == new_block.file_path or
+                    not self._sizes_compatible(new_block, existing_block)):
+                    continue
+                similarity = new_block.similarity_score(existing_block)
+                if similarity >= self.similarity_threshold:
+                    new_duplications.append({
+                        "block1": new_block,
+                        "block2": existing_block,
+                        "similarity": similarity,
+                        "type": "cross_file"
+                    })
+        
+        return self._format_duplications(new_duplications)
+    
+    def _prefilter_candidates(self, file_path: str, candidates: List[str]) -> List[str]:
+        """
+        Drop candidate files sharing fewer than prefilter_min_shared winnowing
+        fingerprint hashes with the target.
+        
+        Args:
+            file_path: File being analyzed
+            candidates: Files that could contain duplicates of it
+            
+        Returns:
+            Candidates worth a full block-level comparison
+        """
+        target_fingerprint = file_fingerprint(file_path)
+        # The target itself is always kept, so it is not fingerprinted twice
+        others = [candidate for candidate in candidates if candidate != file_path]
+        fingerprints = _parallel_map(file_fingerprint, others)
+        kept = {
+            candidate for candidate, fingerprint in zip(others, fingerprints)
+            if shared_fingerprints(target_fingerprint, fingerprint) >= self.prefilter_min_shared
+        }
+        return [
+            candidate for candidate in candidates
+            if candidate == file_path or candidate in kept
+        ]
     
     def _should_skip_file(self, file_path: str) -> bool:
         """Check if a file should be skipped during analysis."""
-        filename = os.path.basename(file_path)
-        
-        # Skip test files, __init__.py, and hook files
-        skip_patterns = [
-            "__init__.py",
-            "test_",
-            "conftest.py",
-            "_test.py",
-            "/.claude/hooks/",
-            "/migrations/",
-            "/alembic/"
-        ]
+        return _SKIP_RE.search(file_path) is not None
+    
+    def _file_blocks(self, file_path: str, content: Optional[str] = None) -> Tuple[List[CodeBlock], List[CodeBlock]]:
+        """
+        Get the function/class blocks and statement blocks of a file.
+        
+        Blocks are cached in memory and their spans on disk, keyed by the
+        file's (mtime_ns, size), so unchanged files are neither read nor
+        parsed again. Safe to call from several threads.
+        
+        Args:
+            file_path: Path to the file
+            content: Pre-read file content (only used on a cache miss)
+            
+        Returns:
+            (definition blocks, statement blocks); statement blocks are only
+            extracted with deep_scan
+        """
+        key, blocks = self._cached_file_blocks(file_path)
+        if blocks is None:
+            blocks = self._store_blocks(file_path, key, self._extract_spans(file_path, content))
+        return blocks
+    
+    def _cached_file_blocks(self, file_path: str) -> Tuple[Optional[Tuple], Optional[Tuple[List[CodeBlock], List[CodeBlock]]]]:
+        """
+        Look up the blocks of a file in the memory and disk caches.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            (validation key, or None if the file cannot be stat'ed;
+            (definition blocks, statement blocks), or None on a cache miss)
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None, None
+        
+        key = (st.st_mtime_ns, st.st_size, self.min_lines, self.deep_scan)
+        cached = _BLOCK_CACHE.get(file_path)
+        if cached is not None and cached[0] == key:
+            return key, (cached[1], cached[2])
         
-        return any(pattern in file_path for pattern in skip_patterns)
+        spans = _load_cached_spans(file_path, key)
+        if spans is None:
+            return key, None
+        return key, self._build_blocks(file_path, key, spans)
+    
+    def _store_blocks(self, file_path: str, key: Optional[Tuple],
+                      spans: Tuple[List[Span], List[Span]]) -> Tuple[List[CodeBlock], List[CodeBlock]]:
+        """Cache freshly extracted spans on disk and build their blocks."""
+        if key is not None:
+            _store_cached_spans(file_path, key, *spans)
+        return self._build_blocks(file_path, key, spans)
+    
+    def _build_blocks(self, file_path: str, key: Optional[Tuple],
+                      spans: Tuple[List[Span], List[Span]]) -> Tuple[List[CodeBlock], List[CodeBlock]]:
+        """Build the CodeBlocks of a file from its spans and cache them in memory."""
+        definitions, statements = (
+            [CodeBlock(text, file_path, start, end) for start, end, text in span_list]
+            for span_list in spans
+        )
+        if key is not None:
+            _BLOCK_CACHE[file_path] = (key, definitions, statements)
+        return definitions, statements
     
-    def _extract_code_blocks(self, file_path: str) -> List[CodeBlock]:
-        """Extract code blocks from a Python file."""
+    def _extract_spans_parallel(self, file_paths: List[str]) -> List[Tuple[List[Span], List[Span]]]:
+        """
+        Extract the spans of several files, in worker processes when worthwhile.
+        
+        ast.parse holds the GIL, so threads cannot parse in parallel; with
+        at least MIN_PROCESS_FILES files a process pool is used instead,
+        unless disable_process_pool() was called.
+        
+        Args:
+            file_paths: Files to read and parse
+            
+        Returns:
+            (definition spans, statement spans) for each file, in order
+        """
+        workers = min(len(file_paths), os.cpu_count() or 1)
+        if _process_pool_allowed and len(file_paths) >= MIN_PROCESS_FILES and workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunksize = max(1, len(file_paths) // (workers * 4))
+                    return list(executor.map(self._extract_spans, file_paths, chunksize=chunksize))
+            except (OSError, BrokenProcessPool):
+                pass  # No worker processes here (e.g. sandboxed); use threads
+        return _parallel_map(self._extract_spans, file_paths)
+    
+    def _extract_spans(self, file_path: str, content: Optional[str] = None) -> Tuple[List[Span], List[Span]]:
+        """Read and parse a file into (definition spans, statement spans)."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                lines = content.split('\n')
+            if content is None:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            lines = content.split('\n')
             
             tree = ast.parse(content)
-            blocks = []
+            definitions = []
             
             # Extract function and class definitions
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
-                    start_line = node.lineno
-                    end_line = node.end_lineno or start_line
-                    
-                    if end_line - start_line + 1 >= self.min_lines:
-                        block_content = '\n'.join(lines[start_line-1:end_line])
-                        block = CodeBlock(block_content, file_path, start_line, end_line)
-                        blocks.append(block)
-                        self.code_blocks.append(block)
+            for node in _iter_definitions(tree):
+                start_line = node.lineno
+                end_line = node.end_lineno or start_line
+                
+                if end_line - start_line + 1 >= self.min_lines:
+                    definitions.append((start_line, end_line, '\n'.join(lines[start_line-1:end_line])))
             
             # Extract significant code blocks (consecutive non-empty lines)
-            self._extract_statement_blocks(file_path, lines)
-            
-            return blocks
+            if not self.deep_scan:
+                return definitions, []
+            return definitions, self._extract_statement_spans(lines)
             
         except Exception as e:
-            print(f"Error analyzing file {file_path}: {str(e)}")
-            return []
+            # stderr: hooks use stdout for their JSON response
+            print(f"Error analyzing file {file_path}: {str(e)}", file=sys.stderr)
+            return [], []
     
-    def _extract_statement_blocks(self, file_path: str, lines: List[str]) -> None:
+    def _extract_statement_spans(self, lines: List[str]) -> List[Span]:
         """Extract blocks of consecutive statements."""
+        spans = []
         current_block = []
         start_line = 0
         
@@ -206,9 +490,7 @@ class DuplicationDetector:
                 
                 if current_block and len(current_block) >= self.min_lines:
                     # End current block
-                    block_content = '\n'.join(current_block)
-                    block = CodeBlock(block_content, file_path, start_line + 1, i)
-                    self.code_blocks.append(block)
+                    spans.append((start_line + 1, i, '\n'.join(current_block)))
                 
                 current_block = []
                 start_line = i + 1
@@ -217,38 +499,104 @@ class DuplicationDetector:
         
         # Handle final block
         if current_block and len(current_block) >= self.min_lines:
-            block_content = '\n'.join(current_block)
-            block = CodeBlock(block_content, file_path, start_line + 1, len(lines))
-            self.code_blocks.append(block)
+            spans.append((start_line + 1, len(lines), '\n'.join(current_block)))
+        
+        return spans
     
     def _find_duplications(self) -> None:
         """Find duplications among extracted code blocks."""
         self.duplications = []
-        processed_pairs = set()
         
-        for i, block1 in enumerate(self.code_blocks):
-            for j, block2 in enumerate(self.code_blocks[i+1:], i+1):
-                # Skip if same file and overlapping lines
-                if (block1.file_path == block2.file_path and 
-                    self._blocks_overlap(block1, block2)):
-                    continue
-                
-                # Skip if already processed
-                pair_key = (min(i, j), max(i, j))
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
+        for i, j in self._candidate_pairs():
+            block1 = self.code_blocks[i]
+            block2 = self.code_blocks[j]
+            
+            # Skip if same file and overlapping lines
+            if (block1.file_path == block2.file_path and 
+                self._blocks_overlap(block1, block2)):
+                continue
+            
+            if not self._sizes_compatible(block1, block2):
+                continue
+            
+            similarity = block1.similarity_score(block2)
+            if similarity >= self.similarity_threshold:
+                duplication_type = "same_file" if block1.file_path == block2.file_path else "cross_file"
                 
-                similarity = block1.similarity_score(block2)
-                if similarity >= self.similarity_threshold:
-                    duplication_type = "same_file" if block1.file_path == block2.file_path else "cross_file"
-                    
-                    self.duplications.append({
-                        "block1": block1,
-                        "block2": block2,
-                        "similarity": similarity,
-                        "type": duplication_type
-                    })
+                self.duplications.append({
+                    "block1": block1,
+                    "block2": block2,
+                    "similarity": similarity,
+                    "type": duplication_type
+                })
+    
+    def _candidate_pairs(self) -> List[Tuple[int, int]]:
+        """
+        Find the block index pairs (i < j) that can reach the similarity threshold.
+        
+        Blocks with identical normalized content (same hash) are always
+        paired. Across distinct contents, prefix filtering is run on one
+        representative block each: with each token set ordered rarest token
+        first, two sets with Jaccard similarity >= t must share a token among
+        the first |A| - ceil(t * |A|) + 1 tokens of each. Pairs sharing no
+        prefix token are never returned, and no pair that could qualify is
+        lost.
+        
+        Returns:
+            Sorted list of candidate (i, j) pairs
+        """
+        blocks = self.code_blocks
+        threshold = self.similarity_threshold
+        if threshold <= 0:
+            return [(i, j) for i in range(len(blocks)) for j in range(i + 1, len(blocks))]
+        
+        # Exact clones: every pair within a hash bucket matches with score 1.0
+        buckets = defaultdict(list)
+        for i, block in enumerate(blocks):
+            buckets[block.hash].append(i)
+        groups = list(buckets.values())
+        
+        pairs = set()
+        for members in groups:
+            pairs.update(combinations(members, 2))
+        
+        # Near clones: prefix filtering over one representative per bucket
+        frequency = Counter(token for members in groups for token in blocks[members[0]].tokens)
+        group_pairs = set()
+        prefix_index = defaultdict(list)
+        for g, members in enumerate(groups):
+            tokens = blocks[members[0]].tokens
+            if not tokens:
+                continue  # Only an identical block can match
+            
+            ordered = sorted(tokens, key=lambda token: (frequency[token], token))
+            # The epsilon keeps float error in t * |A| from shortening the prefix
+            prefix_length = len(ordered) - math.ceil(threshold * len(ordered) - 1e-9) + 1
+            for token in ordered[:prefix_length]:
+                for h in prefix_index[token]:
+                    group_pairs.add((h, g))
+                prefix_index[token].append(g)
+        
+        for h, g in group_pairs:
+            for a in groups[h]:
+                for b in groups[g]:
+                    pairs.add((a, b) if a < b else (b, a))
+        
+        return sorted(pairs)
+    
+    def _sizes_compatible(self, block1: CodeBlock, block2: CodeBlock) -> bool:
+        """
+        Check whether two blocks' token counts allow the similarity threshold.
+        
+        Jaccard similarity is at most min(|A|, |B|) / max(|A|, |B|), so pairs
+        failing this bound are rejected without intersecting their token sets.
+        """
+        size1 = len(block1.tokens)
+        size2 = len(block2.tokens)
+        if size1 > size2:
+            size1, size2 = size2, size1
+        # Same epsilon as in prefix filtering, so no qualifying pair is lost
+        return size1 >= math.ceil(self.similarity_threshold * size2 - 1e-9)
     
     def _blocks_overlap(self, block1: CodeBlock, block2: CodeBlock) -> bool:
         """Check if two blocks overlap in line numbers."""
@@ -334,7 +682,9 @@ class DuplicationDetector:
         return suggestions
 
 
-def detect_duplications_in_file(file_path: str, min_lines: int = 3, similarity_threshold: float = 0.8) -> Dict:
+def detect_duplications_in_file(file_path: str, min_lines: int = 3, similarity_threshold: float = 0.8,
+                                prefilter_min_shared: Optional[int] = None,
+                                deep_scan: bool = False) -> Dict:
     """
     Detect duplications for a specific file.
     
@@ -342,11 +692,16 @@ def detect_duplications_in_file(file_path: str, min_lines: int = 3, similarity_t
         file_path: Path to the file to analyze
         min_lines: Minimum number of lines for a duplication
         similarity_threshold: Minimum similarity score (0.0 to 1.0)
+        prefilter_min_shared: Minimum number of winnowing fingerprint hashes a
+            file must share with the target to be compared at block level;
+            None compares every file
+        deep_scan: Also compare statement runs outside function and class
+            definitions (much slower, mostly low-signal matches)
         
     Returns:
         Dictionary with duplication analysis results
     """
-    detector = DuplicationDetector(min_lines, similarity_threshold)
+    detector = DuplicationDetector(min_lines, similarity_threshold, prefilter_min_shared, deep_scan)
     duplications = detector.analyze_file(file_path)
     
     # Calculate summary statistics
@@ -367,6 +722,21 @@ def detect_duplications_in_file(file_path: str, min_lines: int = 3, similarity_t
     }
 
 
+def preload_blocks(directory: str, min_lines: int = 3, deep_scan: bool = False) -> None:
+    """
+    Load the blocks of every Python file in a directory into the in-process cache.
+    
+    Long-running processes call this ahead of time, so their first analysis
+    does not pay for reading and parsing the whole codebase.
+    
+    Args:
+        directory: Directory to load
+        min_lines: Minimum block size the later analyses will use
+        deep_scan: Whether the later analyses will compare statement blocks
+    """
+    DuplicationDetector(min_lines, deep_scan=deep_scan)._collect_blocks(find_python_files(directory))
+
+
 def calculate_dry_score(duplications: List[Dict]) -> int:
     """
     Calculate a DRY compliance score (0-100).
@@ -9,49 +9,100 @@ and other data structures.
 import ast
 import re
 import os
+import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Class definitions and the node types that can contain them: compound
+# statements other than functions and classes (models are never defined in
+# function bodies, and nested classes such as Meta or Config are part of
+# their model). Matched by exact type, which is cheaper than isinstance
+# against a long tuple
+_CLASS_CONTAINER_TYPES = frozenset({
+    ast.ClassDef, ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith,
+    ast.Try, getattr(ast, "TryStar", ast.Try), ast.Match, ast.ExceptHandler, ast.match_case
+})
+
+# Base classes marking SQLAlchemy and Pydantic models
+_SQLALCHEMY_BASES = frozenset({"Base", "Model", "db.Model"})
+_PYDANTIC_BASES = frozenset({"BaseModel", "pydantic.BaseModel"})
 
 
 class ModelParser:
     """Parse Python files to extract model definitions."""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, content: Optional[str] = None):
         self.file_path = file_path
+        self.content = content
         self.models = []
         
     def parse_file(self) -> List[Dict]:
         """
         Parse the file and extract model definitions.
         
+        The file is only read if no content was given to the constructor.
+        Unreadable files and invalid source yield no models; any other
+        exception is a bug and propagates.
+        
         Returns:
             List of model dictionaries with fields and metadata
         """
+        content = self.content
+        if content is None:
+            try:
+                with open(self.file_path, 'r') as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                return self._parse_error(e)
+        
         try:
-            with open(self.file_path, 'r') as f:
-                content = f.read()
-            
-            tree = ast.parse(content)
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    model_info = self._parse_class(node, content)
-                    if model_info and self._is_model_class(model_info):
-                        self.models.append(model_info)
-            
-            return self.models
-            
-        except Exception as e:
-            print(f"Error parsing file {self.file_path}: {str(e)}")
-            return []
+            tree = ast.parse(content, filename=self.file_path)
+        except (SyntaxError, ValueError) as e:
+            # ValueError: source containing null bytes
+            return self._parse_error(e)
+        
+        # Imports are per file, so extract them once for all classes
+        imports = self._extract_imports(tree)
+        
+        for node in self._iter_class_defs(tree):
+            model_info = self._parse_class(node, imports)
+            if model_info and self._is_model_class(model_info):
+                self.models.append(model_info)
+        
+        return self.models
+    
+    def _parse_error(self, error: Exception) -> List[Dict]:
+        """Report a file that cannot be parsed and return no models."""
+        # stderr: hooks use stdout for their JSON response
+        print(f"Error parsing file {self.file_path}: {str(error)}", file=sys.stderr)
+        return []
     
-    def _parse_class(self, node: ast.ClassDef, content: str) -> Dict:
+    @staticmethod
+    def _iter_class_defs(tree: ast.Module) -> Iterator[ast.ClassDef]:
+        """
+        Yield class definitions in ast.walk order, only descending into
+        statements that can contain one (never expressions, simple statements,
+        function bodies or class bodies: _parse_class handles the latter).
+        """
+        queue = deque(node for node in tree.body if type(node) in _CLASS_CONTAINER_TYPES)
+        while queue:
+            node = queue.popleft()
+            if isinstance(node, ast.ClassDef):
+                yield node
+                continue
+            queue.extend(
+                child for child in ast.iter_child_nodes(node)
+                if type(child) in _CLASS_CONTAINER_TYPES
+            )
+    
+    def _parse_class(self, node: ast.ClassDef, imports: List[str]) -> Dict:
         """Parse a class definition and extract field information."""
         model_info = {
             "name": node.name,
             "base_classes": [self._get_name(base) for base in node.bases],
             "fields": [],
-            "imports": self._extract_imports(content),
+            "imports": imports,
             "is_sqlalchemy": False,
             "is_pydantic": False,
             "table_name": None
@@ -59,42 +110,74 @@ class ModelParser:
         
         # Check if it's a SQLAlchemy or Pydantic model
         base_classes = model_info["base_classes"]
-        model_info["is_sqlalchemy"] = any(base in ["Base", "Model", "db.Model"] for base in base_classes)
-        model_info["is_pydantic"] = any(base in ["BaseModel", "pydantic.BaseModel"] for base in base_classes)
+        model_info["is_sqlalchemy"] = not _SQLALCHEMY_BASES.isdisjoint(base_classes)
+        model_info["is_pydantic"] = not _PYDANTIC_BASES.isdisjoint(base_classes)
         
-        # Parse fields
+        # Parse fields, picking up the SQLAlchemy table name in the same pass
         for item in node.body:
             if isinstance(item, ast.Assign):
                 field_info = self._parse_field(item)
                 if field_info:
                     model_info["fields"].append(field_info)
+                if model_info["table_name"] is None:
+                    model_info["table_name"] = self._table_name(item)
             elif isinstance(item, ast.AnnAssign):
                 field_info = self._parse_annotated_field(item)
                 if field_info:
                     model_info["fields"].append(field_info)
         
-        # Extract table name for SQLAlchemy models
-        model_info["table_name"] = self._extract_table_name(node)
-        
         return model_info
     
     def _parse_field(self, node: ast.Assign) -> Optional[Dict]:
-        """Parse a regular field assignment."""
+        """
+        Parse a regular field assignment.
+        
+        A Column call's name, arguments and keywords are each inspected once,
+        with the keywords looked up in a dict instead of one scan per flag.
+        """
         if not node.targets or not isinstance(node.targets[0], ast.Name):
             return None
         
-        field_name = node.targets[0].id
-        field_type = self._infer_type_from_value(node.value)
-        
-        return {
-            "name": field_name,
-            "type": field_type,
-            "nullable": self._is_nullable(node.value),
-            "primary_key": self._is_primary_key(node.value),
-            "foreign_key": self._is_foreign_key(node.value),
-            "unique": self._is_unique(node.value),
-            "default": self._extract_default(node.value)
+        field_info = {
+            "name": node.targets[0].id,
+            "type": "Unknown",
+            "nullable": True,
+            "primary_key": False,
+            "foreign_key": False,
+            "unique": False,
+            "default": None
         }
+        
+        value = node.value
+        if not isinstance(value, ast.Call):
+            field_info["default"] = self._extract_default(value)
+            return field_info
+        
+        func_name = self._get_name(value.func)
+        if "Column" not in func_name:
+            if "relationship" in func_name:
+                field_info["type"] = "relationship"
+            return field_info
+        
+        if value.args:
+            field_info["type"] = self._get_name(value.args[0])
+        field_info["foreign_key"] = any(
+            isinstance(arg, ast.Call) and "ForeignKey" in self._get_name(arg.func)
+            for arg in value.args
+        )
+        
+        # Non-constant flags fall back to the column defaults
+        keywords = {keyword.arg: keyword.value for keyword in value.keywords}
+        for flag, fallback in (("nullable", True), ("primary_key", False), ("unique", False)):
+            if flag in keywords:
+                flag_value = keywords[flag]
+                field_info[flag] = flag_value.value if isinstance(flag_value, ast.Constant) else fallback
+        
+        default = keywords.get("default")
+        if default is not None:
+            field_info["default"] = repr(default.value) if isinstance(default, ast.Constant) else self._get_name(default)
+        
+        return field_info
     
     def _parse_annotated_field(self, node: ast.AnnAssign) -> Optional[Dict]:
         """Parse an annotated field assignment."""
@@ -115,69 +198,23 @@ class ModelParser:
         }
     
     def _get_name(self, node) -> str:
-        """Get the name of an AST node."""
+        """
+        Get the name of an AST node.
+        
+        Plain names and constants are read directly; anything else (dotted
+        names, calls such as String(50)) is rendered with ast.unparse.
+        """
         if isinstance(node, ast.Name):
             return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self._get_name(node.value)}.{node.attr}"
         elif isinstance(node, ast.Constant):
             return str(node.value)
-        else:
-            return "Unknown"
+        return ast.unparse(node)
     
     def _get_type_annotation(self, node) -> str:
-        """Get the type annotation as a string."""
+        """Get the type annotation as a string (e.g. Optional[List[int]])."""
         if isinstance(node, ast.Name):
             return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self._get_name(node.value)}.{node.attr}"
-        elif isinstance(node, ast.Subscript):
-            return f"{self._get_name(node.value)}[{self._get_name(node.slice)}]"
-        else:
-            return "Any"
-    
-    def _infer_type_from_value(self, node) -> str:
-        """Infer the field type from its value (SQLAlchemy Column, etc.)."""
-        if isinstance(node, ast.Call):
-            func_name = self._get_name(node.func)
-            if "Column" in func_name:
-                if node.args:
-                    return self._get_name(node.args[0])
-            elif "relationship" in func_name:
-                return "relationship"
-        return "Unknown"
-    
-    def _is_nullable(self, node) -> bool:
-        """Check if a field is nullable."""
-        if isinstance(node, ast.Call) and "Column" in self._get_name(node.func):
-            for keyword in node.keywords:
-                if keyword.arg == "nullable":
-                    return keyword.value.value if isinstance(keyword.value, ast.Constant) else True
-        return True
-    
-    def _is_primary_key(self, node) -> bool:
-        """Check if a field is a primary key."""
-        if isinstance(node, ast.Call) and "Column" in self._get_name(node.func):
-            for keyword in node.keywords:
-                if keyword.arg == "primary_key":
-                    return keyword.value.value if isinstance(keyword.value, ast.Constant) else False
-        return False
-    
-    def _is_foreign_key(self, node) -> bool:
-        """Check if a field is a foreign key."""
-        if isinstance(node, ast.Call) and "Column" in self._get_name(node.func):
-            for arg in node.args:
-                if isinstance(arg, ast.Call) and "ForeignKey" in self._get_name(arg.func):
-                    return True
-        return False
-    
-    def _is_unique(self, node) -> bool:
-        """Check if a field is unique."""
-        if isinstance(node, ast.Call) and "Column" in self._get_name(node.func):
-            for keyword in node.keywords:
-                if keyword.arg == "unique":
-                    return keyword.value.value if isinstance(keyword.value, ast.Constant) else False
-        return False
+        return ast.unparse(node)
     
     def _extract_default(self, node) -> Optional[str]:
         """Extract default value from a field."""
@@ -192,35 +229,25 @@ class ModelParser:
             return repr(node.value)
         return None
     
-    def _extract_table_name(self, node: ast.ClassDef) -> Optional[str]:
-        """Extract table name from SQLAlchemy model."""
-        for item in node.body:
-            if isinstance(item, ast.Assign):
-                for target in item.targets:
-                    if isinstance(target, ast.Name) and target.id == "__tablename__":
-                        if isinstance(item.value, ast.Constant):
-                            return item.value.value
+    def _table_name(self, node: ast.Assign) -> Optional[str]:
+        """Get the table name if the assignment sets a SQLAlchemy __tablename__."""
+        if isinstance(node.value, ast.Constant):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id == "__tablename__":
+                    return node.value.value
         return None
     
-    def _extract_imports(self, content: str) -> List[str]:
-        """Extract import statements from file content."""
-        imports = []
-        for line in content.split('\n'):
-            line = line.strip()
-            if line.startswith('import ') or line.startswith('from '):
-                imports.append(line)
-        return imports
+    def _extract_imports(self, tree: ast.Module) -> List[str]:
+        """Extract the module-level import statements from a parsed file."""
+        return [
+            ast.unparse(node) for node in tree.body
+            if isinstance(node, (ast.Import, ast.ImportFrom))
+        ]
     
     def _is_model_class(self, model_info: Dict) -> bool:
         """Check if a class is likely a data model."""
-        base_classes = model_info["base_classes"]
-        
-        # SQLAlchemy models
-        if any(base in ["Base", "Model", "db.Model"] for base in base_classes):
-            return True
-        
-        # Pydantic models
-        if any(base in ["BaseModel", "pydantic.BaseModel"] for base in base_classes):
+        # SQLAlchemy and Pydantic models (flags set by _parse_class)
+        if model_info["is_sqlalchemy"] or model_info["is_pydantic"]:
             return True
         
         # Check for common model patterns
@@ -233,8 +260,9 @@ class ModelParser:
 class FactoryGenerator:
     """Generate Factory Boy factory definitions for models."""
     
-    def __init__(self, model_info: Dict):
+    def __init__(self, model_info: Dict, model_import_path: str = "src.models"):
         self.model_info = model_info
+        self.model_import_path = model_import_path
         
     def generate_factory(self) -> str:
         """
@@ -243,17 +271,26 @@ class FactoryGenerator:
         Returns:
             String containing the factory definition
         """
+        return "\n".join(self._factory_lines())
+    
+    def _factory_lines(self) -> List[str]:
+        """Generate the lines of the factory definition."""
         model_name = self.model_info["name"]
         factory_name = f"{model_name}Factory"
         
         # Start building the factory
         factory_lines = []
-        factory_lines.append(f"class {factory_name}(factory.Factory):")
+        # sqlalchemy_session is only a valid Meta option on the SQLAlchemy base
+        if self.model_info["is_sqlalchemy"]:
+            factory_lines.append(f"class {factory_name}(factory.alchemy.SQLAlchemyModelFactory):")
+        else:
+            factory_lines.append(f"class {factory_name}(factory.Factory):")
         factory_lines.append("    class Meta:")
         
         if self.model_info["is_sqlalchemy"]:
             factory_lines.append(f"        model = {model_name}")
-            factory_lines.append("        sqlalchemy_session = Session")
+            # No session exists at import time; a conftest fixture binds one
+            factory_lines.append("        sqlalchemy_session = None")
             factory_lines.append("        sqlalchemy_session_persistence = 'commit'")
         else:
             factory_lines.append(f"        model = {model_name}")
@@ -274,28 +311,33 @@ class FactoryGenerator:
             for trait in traits:
                 factory_lines.append(f"        {trait}")
         
-        return "\n".join(factory_lines)
+        return factory_lines
+    
+    def has_field_definitions(self) -> bool:
+        """Check whether the factory sets at least one of the model's fields."""
+        return any(self._generate_field_definition(field) for field in self.model_info["fields"])
     
     def _generate_field_definition(self, field: Dict) -> Optional[str]:
         """Generate a field definition for the factory."""
         field_name = field["name"]
         field_type = field["type"]
         
-        # Skip primary keys and relationships
-        if field["primary_key"] or field_type == "relationship":
+        # Skip primary keys, relationships and class attributes such as __tablename__
+        if field["primary_key"] or field_type == "relationship" or field_name.startswith("__"):
             return None
         
         # Generate appropriate factory definition based on type
         if "Integer" in field_type or "int" in field_type:
             return f"{field_name} = factory.Sequence(lambda n: n + 1)"
         elif "String" in field_type or "str" in field_type:
-            if "email" in field_name.lower():
+            lowered_name = field_name.lower()
+            if "email" in lowered_name:
                 return f"{field_name} = factory.Faker('email')"
-            elif "name" in field_name.lower():
+            elif "name" in lowered_name:
                 return f"{field_name} = factory.Faker('name')"
-            elif "phone" in field_name.lower():
+            elif "phone" in lowered_name:
                 return f"{field_name} = factory.Faker('phone_number')"
-            elif "address" in field_name.lower():
+            elif "address" in lowered_name:
                 return f"{field_name} = factory.Faker('address')"
             else:
                 return f"{field_name} = factory.Faker('text', max_nb_chars=50)"
@@ -333,6 +375,10 @@ class FactoryGenerator:
     
     def generate_imports(self) -> str:
         """Generate necessary import statements for the factory."""
+        return "\n".join(self._import_lines())
+    
+    def _import_lines(self) -> List[str]:
+        """Generate the import statements needed by the factory, one per line."""
         imports = [
             "import factory",
             "from factory import Faker, Sequence, Trait",
@@ -341,13 +387,13 @@ class FactoryGenerator:
         
         # Add SQLAlchemy imports if needed
         if self.model_info["is_sqlalchemy"]:
-            imports.append("from sqlalchemy.orm import Session")
+            imports.append("import factory.alchemy")
         
         # Add model import
         model_name = self.model_info["name"]
-        imports.append(f"from src.models import {model_name}")
+        imports.append(f"from {self.model_import_path} import {model_name}")
         
-        return "\n".join(imports)
+        return imports
 
 
 def generate_factory_file(model_file: str, output_file: str = None) -> bool:
@@ -367,7 +413,7 @@ def generate_factory_file(model_file: str, output_file: str = None) -> bool:
         models = parser.parse_file()
         
         if not models:
-            print(f"No models found in {model_file}")
+            print(f"No models found in {model_file}", file=sys.stderr)
             return False
         
         # Determine output file
@@ -384,29 +430,37 @@ def generate_factory_file(model_file: str, output_file: str = None) -> bool:
             else:
                 output_file = str(model_path.with_name(f"factory_{model_path.stem}.py"))
         
-        # Generate factory content
+        # Generate factory content as one list of lines, joined once
+        generators = [FactoryGenerator(model) for model in models]
         content_lines = []
         
-        # Generate imports (combine from all models)
-        all_imports = set()
-        for model in models:
-            generator = FactoryGenerator(model)
-            imports = generator.generate_imports()
-            for imp in imports.split('\n'):
-                all_imports.add(imp)
+        # Generate imports (combine from all models); dict keys drop duplicates
+        # but keep first-seen order, so the factory imports stay grouped ahead
+        # of the model imports
+        all_imports = {}
+        for generator in generators:
+            all_imports.update(dict.fromkeys(generator._import_lines()))
         
-        content_lines.extend(sorted(all_imports))
+        content_lines.extend(all_imports)
         content_lines.append("")
         content_lines.append("")
         
         # Generate factories
-        for model in models:
-            generator = FactoryGenerator(model)
-            factory_code = generator.generate_factory()
-            content_lines.append(factory_code)
+        for generator in generators:
+            content_lines.extend(generator._factory_lines())
             content_lines.append("")
             content_lines.append("")
         
+        # Register for test-database population only the factories that can
+        # create instances as generated (SQLAlchemy ones still need a session)
+        registered = [
+            f"{generator.model_info['name']}Factory," for generator in generators
+            if not generator.model_info["is_sqlalchemy"] and generator.has_field_definitions()
+        ]
+        content_lines.append("# Factories used to pre-populate the test database before pytest runs")
+        content_lines.append(f"FACTORIES = ({' '.join(registered)})")
+        content_lines.append("")
+        
         # Write the file
         output_path = Path(output_file)
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -414,9 +468,9 @@ def generate_factory_file(model_file: str, output_file: str = None) -> bool:
         with open(output_file, 'w') as f:
             f.write("\n".join(content_lines))
         
-        print(f"Generated factory file: {output_file}")
+        print(f"Generated factory file: {output_file}", file=sys.stderr)
         return True
         
     except Exception as e:
-        print(f"Error generating factory file: {str(e)}")
-        return False
\ No newline at end of file
+        print(f"Error generating factory file: {str(e)}", file=sys.stderr)
+        return False
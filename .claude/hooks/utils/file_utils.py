@@ -6,10 +6,42 @@ Provides functions for file path manipulation, Python file detection,
 and project structure navigation.
 """
 
+import fnmatch
 import os
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, List, Optional
+
+
+# A line starting a class definition (possibly nested), matched on raw bytes
+_CLASS_STATEMENT_RE = re.compile(rb'^[ \t]*class[ \t]', re.MULTILINE)
+
+# Directories never searched for Python sources (VCS data, caches, environments)
+_SKIP_DIRS = frozenset({
+    ".git", "__pycache__", ".venv", "venv", "node_modules",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox"
+})
+
+# Paths of files that usually hold data models
+_MODEL_PATH_RE = re.compile(r'/models/|/model\.py$|_model\.py$|/entities/|/schemas/')
+
+
+@lru_cache(maxsize=1024)
+def _as_path(path: str) -> Path:
+    """
+    Get a Path for a path string, memoized.
+    
+    Hooks in the daemon see the same file and root paths on call after call;
+    Path objects are immutable, so one instance per string can be shared.
+    
+    Args:
+        path: Path string
+        
+    Returns:
+        Path object for the string
+    """
+    return Path(path)
 
 
 def get_corresponding_test_file(source_file: str) -> str:
@@ -26,13 +58,14 @@ def get_corresponding_test_file(source_file: str) -> str:
         src/agents/user_input.py -> tests/test_user_input.py
         src/models/hsa_profile.py -> tests/test_hsa_profile.py
     """
-    source_path = Path(source_file)
+    source_path = _as_path(source_file)
     
     # Extract the filename without extension
     filename = source_path.stem
     
-    # Remove 'src/' prefix if present and construct test path
-    if 'src/' in str(source_path):
+    # Remove 'src/' prefix if present and construct test path (matched as a
+    # whole path component, so e.g. my_src/ does not count)
+    if 'src' in source_path.parts[:-1]:
         # For files in src/, put tests in tests/ directory
         test_filename = f"test_{filename}.py"
         return f"tests/{test_filename}"
@@ -52,7 +85,7 @@ def get_corresponding_source_file(test_file: str) -> str:
     Returns:
         Path to the corresponding source file
     """
-    test_path = Path(test_file)
+    test_path = _as_path(test_file)
     
     # Remove 'test_' prefix from filename
     filename = test_path.stem
@@ -62,7 +95,7 @@ def get_corresponding_source_file(test_file: str) -> str:
         source_filename = filename + '.py'
     
     # If test is in tests/ directory, source is likely in src/
-    if 'tests/' in str(test_path):
+    if 'tests' in test_path.parts[:-1]:
         return f"src/{source_filename}"
     else:
         return str(test_path.parent / source_filename)
@@ -102,9 +135,11 @@ def is_test_file(file_path: str) -> bool:
     Returns:
         True if the file is a test file
     """
-    filename = Path(file_path).name
-    return (filename.startswith('test_') and filename.endswith('.py')) or \
-           ('tests/' in file_path and filename.endswith('.py'))
+    # Plain string checks - this runs on every hook call, so avoid pathlib
+    if not file_path.endswith('.py'):
+        return False
+    filename = os.path.basename(file_path)
+    return filename.startswith('test_') or filename.endswith('_test.py') or 'tests/' in file_path
 
 
 def is_model_file(file_path: str) -> bool:
@@ -121,25 +156,39 @@ def is_model_file(file_path: str) -> bool:
         return False
     
     # Check file path patterns
-    path_patterns = [
-        r'/models/',
-        r'/model\.py$',
-        r'_model\.py$',
-        r'/entities/',
-        r'/schemas/',
-    ]
-    
-    for pattern in path_patterns:
-        if re.search(pattern, file_path):
-            return True
+    if not _MODEL_PATH_RE.search(file_path):
+        return False
     
-    return False
+    # Models are classes: a byte scan rules out files without any class
+    # statement before anyone pays for ast.parse
+    return _has_class_statement(file_path)
+
+
+def _has_class_statement(file_path: str) -> bool:
+    """
+    Check whether a file contains a class statement, without parsing it.
+    
+    Args:
+        file_path: Path to the file to check
+        
+    Returns:
+        True if some line starts with a class statement
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return _CLASS_STATEMENT_RE.search(f.read()) is not None
+    except OSError:
+        return False
 
 
+@lru_cache(maxsize=1)
 def get_project_root() -> str:
     """
     Get the project root directory (where .claude directory is located).
     
+    Memoized like get_use_case_root, so the upward directory walk happens at
+    most once per process (get_relative_path falls back to it).
+    
     Returns:
         Path to the project root directory
     """
@@ -153,10 +202,14 @@ def get_project_root() -> str:
     return str(Path.cwd())
 
 
+@lru_cache(maxsize=1)
 def get_use_case_root() -> str:
     """
     Get the use-case directory where all project code should be located.
     
+    The result is memoized since hooks call this several times per invocation
+    and the project root does not change during a process lifetime.
+    
     Returns:
         Path to the use-case directory
     """
@@ -164,22 +217,139 @@ def get_use_case_root() -> str:
     return os.path.join(project_root, 'use-case')
 
 
+def is_in_use_case(file_path: str) -> bool:
+    """
+    Check whether a file lies inside the use-case directory.
+    
+    Paths are compared by component, so e.g. use-case-old/ does not count
+    as use-case/.
+    
+    Args:
+        file_path: Path to check (relative paths are resolved against the cwd)
+        
+    Returns:
+        True if the file is inside the use-case directory
+    """
+    return Path(os.path.abspath(file_path)).is_relative_to(get_use_case_root())
+
+
+@lru_cache(maxsize=None)
+def list_directory(directory: str) -> Dict[str, bool]:
+    """
+    List a directory once per process with a single scandir.
+    
+    Call list_directory.cache_clear() after creating or removing entries
+    that later lookups in the same process need to see.
+    
+    Args:
+        directory: Directory to list
+        
+    Returns:
+        Mapping of entry name to whether it is a directory (empty if the
+        directory does not exist); treat it as read-only
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name: entry.is_dir() for entry in entries}
+    except OSError:
+        return {}
+
+
+def cached_exists(base_path: str, *parts: str) -> bool:
+    """
+    Check whether base_path/parts... exists using cached directory listings.
+    
+    Probing several candidate paths under the same directories this way
+    costs one scandir per directory instead of one stat per candidate.
+    
+    Args:
+        base_path: Existing directory the parts are relative to
+        *parts: Path components below base_path
+        
+    Returns:
+        True if the path exists (intermediate components must be directories)
+    """
+    directory = base_path
+    for i, part in enumerate(parts):
+        listing = list_directory(directory)
+        if part not in listing:
+            return False
+        if i < len(parts) - 1 and not listing[part]:
+            return False
+        directory = os.path.join(directory, part)
+    return True
+
+
 def find_python_files(directory: str, pattern: str = "*.py") -> List[str]:
     """
     Find all Python files in a directory matching a pattern.
     
+    Walks the tree with os.scandir, in the order Path.rglob would use (each
+    directory's files, then its subdirectories depth-first), without
+    descending into symlinked directories or the cache and environment
+    directories in _SKIP_DIRS.
+    
     Args:
         directory: Directory to search in
         pattern: File pattern to match (default: "*.py")
         
     Returns:
-        List of file paths matching the pattern
+        List of file paths matching the pattern (empty if the directory
+        does not exist)
     """
-    directory_path = Path(directory)
-    if not directory_path.exists():
-        return []
+    if pattern == "*.py":
+        matches = lambda name: name.endswith(".py")
+    else:
+        matches = re.compile(fnmatch.translate(pattern)).match
     
-    return [str(path) for path in directory_path.rglob(pattern)]
+    files = []
+    pending = [str(Path(directory))]
+    while pending:
+        subdirectories = []
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            subdirectories.append(entry.path)
+                    elif matches(entry.name):
+                        files.append(entry.path)
+        except OSError:
+            continue
+        # Reversed so the first subdirectory is popped (and walked) first
+        pending.extend(reversed(subdirectories))
+    
+    return files
+
+
+def contains_python_file(directory: str, prefix: str = "") -> bool:
+    """
+    Check whether a directory tree contains a Python file.
+    
+    Unlike find_python_files this stops at the first match instead of
+    listing the whole tree.
+    
+    Args:
+        directory: Directory to search in
+        prefix: Required file name prefix (e.g. "test_")
+        
+    Returns:
+        True if some file below the directory is named prefix*.py (False if
+        the directory does not exist)
+    """
+    pending = [directory]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    # Like rglob, do not descend into symlinked directories
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith('.py') and entry.name.startswith(prefix):
+                        return True
+        except OSError:
+            continue
+    return False
 
 
 def get_relative_path(file_path: str, base_path: str = None) -> str:
@@ -197,7 +367,7 @@ def get_relative_path(file_path: str, base_path: str = None) -> str:
         base_path = get_project_root()
     
     try:
-        return str(Path(file_path).relative_to(Path(base_path)))
+        return str(_as_path(file_path).relative_to(_as_path(base_path)))
     except ValueError:
         # If file_path is not relative to base_path, return as-is
         return file_path
\ No newline at end of file
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Document fingerprinting utility for Claude Code Hooks
+
+Implements winnowing (Schleimer et al., the algorithm behind MOSS) over
+normalized code tokens. Fingerprints give a cheap estimate of how much two
+files have in common, which lets the duplication detector skip files that
+cannot contain duplicates before running the expensive block comparison.
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Rolling hash parameters (Rabin-Karp over token hashes)
+_HASH_BASE = 257
+_HASH_MOD = (1 << 61) - 1
+
+_COMMENT_RE = re.compile(r'#.*$', re.MULTILINE)
+_STRING_RE = re.compile(r'(["\']).*?\1')
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+# Fingerprints per file, validated against (mtime_ns, size); kept next to
+# the duplication detector's block span cache
+FINGERPRINT_CACHE_DIR = Path.home() / ".cache" / "claude_hooks" / "dup_fingerprints"
+
+# File path -> (validation key, fingerprint set); keyed by path so that a
+# long-lived process keeps one entry per file rather than one per version
+_FINGERPRINT_CACHE: Dict[str, Tuple[Tuple[int, int], Set[int]]] = {}
+
+
+def tokenize(content: str) -> List[str]:
+    """
+    Split source code into normalized tokens.
+
+    Comments are dropped and string literals collapsed so that fingerprints
+    reflect code structure rather than text.
+
+    Args:
+        content: Source code
+
+    Returns:
+        List of tokens
+    """
+    content = _COMMENT_RE.sub('', content)
+    content = _STRING_RE.sub('""', content)
+    return _TOKEN_RE.findall(content)
+
+
+def winnow(tokens: List[str], k: int = 5, w: int = 4) -> Set[int]:
+    """
+    Compute the winnowing fingerprint of a token sequence.
+
+    Hashes every k-gram of tokens with a rolling hash, then keeps the minimum
+    hash of each window of w consecutive k-gram hashes.
+
+    Args:
+        tokens: Token sequence
+        k: Number of tokens per k-gram
+        w: Winnowing window size
+
+    Returns:
+        Set of selected k-gram hashes
+    """
+    if len(tokens) < k:
+        return set()
+
+    # Stable per-token hashes (the builtin hash() is randomized per process)
+    token_hashes = [zlib.crc32(token.encode()) for token in tokens]
+    high_power = pow(_HASH_BASE, k - 1, _HASH_MOD)
+
+    kgram_hashes = []
+    h = 0
+    for i, th in enumerate(token_hashes):
+        if i >= k:
+            h = (h - token_hashes[i - k] * high_power) % _HASH_MOD
+        h = (h * _HASH_BASE + th) % _HASH_MOD
+        if i >= k - 1:
+            kgram_hashes.append(h)
+
+    if len(kgram_hashes) <= w:
+        return {min(kgram_hashes)}
+
+    return {min(kgram_hashes[i:i + w]) for i in range(len(kgram_hashes) - w + 1)}
+
+
+def _fingerprint_cache_path(file_path: str) -> Path:
+    """Get the cache file holding the fingerprint of a source file."""
+    return FINGERPRINT_CACHE_DIR / f"{hashlib.sha1(file_path.encode()).hexdigest()}.json"
+
+
+def _load_cached_fingerprint(file_path: str, key: Tuple[int, int]) -> Optional[Set[int]]:
+    """
+    Load the fingerprint cached on disk for a file if it is still valid.
+
+    Args:
+        file_path: Path to the source file
+        key: Current (mtime_ns, size) of the file
+
+    Returns:
+        Fingerprint set, or None on a cache miss
+    """
+    try:
+        with open(_fingerprint_cache_path(file_path), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if tuple(entry.get("key", ())) != key:
+        return None
+    return set(entry["hashes"])
+
+
+def _store_cached_fingerprint(file_path: str, key: Tuple[int, int], fingerprint: Set[int]) -> None:
+    """
+    Cache the fingerprint of a file on disk, replacing any stale entry.
+
+    Args:
+        file_path: Path to the source file
+        key: (mtime_ns, size) the fingerprint was computed for
+        fingerprint: Fingerprint set
+    """
+    cache_path = _fingerprint_cache_path(file_path)
+    try:
+        FINGERPRINT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent hooks never read a partial file
+        temp_path = f"{cache_path}.{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "hashes": list(fingerprint)}, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # Caching is best-effort
+
+
+def file_fingerprint(file_path: str) -> Set[int]:
+    """
+    Get the winnowing fingerprint of a file.
+
+    Cached in memory and on disk, and validated against the file's mtime and
+    size, so unchanged files are neither read nor re-winnowed.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Set of fingerprint hashes (empty if the file cannot be read)
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return set()
+    key = (st.st_mtime_ns, st.st_size)
+
+    cached = _FINGERPRINT_CACHE.get(file_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    fingerprint = _load_cached_fingerprint(file_path, key)
+    if fingerprint is None:
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return set()
+        fingerprint = winnow(tokenize(data.decode('utf-8', errors='ignore')))
+        _store_cached_fingerprint(file_path, key, fingerprint)
+
+    _FINGERPRINT_CACHE[file_path] = (key, fingerprint)
+    return fingerprint
+
+
+def shared_fingerprints(fingerprint1: Set[int], fingerprint2: Set[int]) -> int:
+    """
+    Count the fingerprint hashes two documents have in common.
+
+    An absolute count rather than a ratio: a duplicated function yields the
+    same number of shared hashes however large the files around it are.
+    Winnowing guarantees a shared hash for any common run of (w + k - 1)
+    tokens (8 with the defaults). Longer runs usually share more, but not
+    necessarily: fingerprints are sets, so repeated hash values count once.
+
+    Args:
+        fingerprint1: Fingerprint of the first document
+        fingerprint2: Fingerprint of the second document
+
+    Returns:
+        |A ∩ B|
+    """
+    return len(fingerprint1 & fingerprint2)
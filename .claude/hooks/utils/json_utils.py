@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+JSON utility functions for Claude Code Hooks
+
+Provides compact JSON encoding for hook responses and decoding of hook input,
+using orjson when it is installed and falling back to the standard library
+otherwise. Decoding errors are always raised as json.JSONDecodeError (orjson's
+error type subclasses it).
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> str:
+        """
+        Serialize an object to a compact JSON string.
+
+        Args:
+            obj: JSON-serializable object
+
+        Returns:
+            JSON string
+        """
+        return orjson.dumps(obj).decode()
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """
+        Parse a JSON document.
+
+        Args:
+            data: JSON document as bytes or str
+
+        Returns:
+            Parsed object
+
+        Raises:
+            json.JSONDecodeError: If the document is not valid JSON
+        """
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> str:
+        """
+        Serialize an object to a compact JSON string.
+
+        Args:
+            obj: JSON-serializable object
+
+        Returns:
+            JSON string
+        """
+        return json.dumps(obj, separators=(',', ':'))
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """
+        Parse a JSON document.
+
+        Args:
+            data: JSON document as bytes or str
+
+        Returns:
+            Parsed object
+
+        Raises:
+            json.JSONDecodeError: If the document is not valid JSON
+        """
+        return json.loads(data)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Ruff language server client for Claude Code Hooks
+
+Talks the Language Server Protocol to a long-lived `ruff server` process so
+that formatting and linting a file does not pay ruff's start-up cost on every
+hook invocation. The server only outlives a single hook run inside the hooks
+daemon, which enables it with enable_persistent_server(); elsewhere
+get_ruff_client() returns None and callers use the ruff command line instead.
+"""
+
+import os
+import re
+import select
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.json_utils import dumps, loads
+
+# Seconds to wait for a single server response
+RESPONSE_TIMEOUT = 30
+
+_LINE_BREAK_RE = re.compile(r'\r\n|\r|\n')
+
+_client: Optional["RuffServerClient"] = None
+_persistent = False
+# Set once a server failed to start; the CLI is used from then on
+_unavailable = False
+
+
+class RuffServerError(Exception):
+    """Raised when the ruff server cannot serve a request."""
+
+
+class RuffServerClient:
+    """
+    Minimal LSP client for `ruff server` over stdio.
+
+    Only the requests needed by the hooks are implemented: document
+    formatting and pull diagnostics. Positions are negotiated as UTF-32 so
+    that LSP character offsets are Python string indices.
+    """
+
+    def __init__(self, root: str):
+        """
+        Start the server and perform the LSP initialization handshake.
+
+        Args:
+            root: Workspace root used for ruff configuration discovery
+
+        Raises:
+            RuffServerError: If the server cannot be started or initialized
+        """
+        self._next_id = 0
+        self._buffer = b""
+        self._version = 0
+
+        try:
+            self._process = subprocess.Popen(
+                [shutil.which("ruff") or "ruff", "server"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise RuffServerError(f"Could not start ruff server: {e}")
+
+        root_uri = Path(root).resolve().as_uri()
+        try:
+            result = self._request("initialize", {
+                "processId": os.getpid(),
+                "rootUri": root_uri,
+                "workspaceFolders": [{"uri": root_uri, "name": Path(root).name}],
+                "capabilities": {
+                    "general": {"positionEncodings": ["utf-32"]},
+                    "textDocument": {
+                        "formatting": {"dynamicRegistration": False},
+                        "diagnostic": {"dynamicRegistration": False}
+                    }
+                }
+            })
+            if result.get("capabilities", {}).get("positionEncoding") != "utf-32":
+                raise RuffServerError("ruff server does not support UTF-32 positions")
+            self._notify("initialized", {})
+        except Exception as e:
+            # A server that never initialized cannot be asked to shut down
+            self._process.kill()
+            self._process.wait()
+            if isinstance(e, RuffServerError):
+                raise
+            raise RuffServerError(f"Could not initialize ruff server: {e}")
+
+    def is_alive(self) -> bool:
+        """Check whether the server process is still running."""
+        return self._process.poll() is None
+
+    def format(self, file_path: str, content: str) -> str:
+        """
+        Format a document.
+
+        Args:
+            file_path: Path of the document (used for configuration lookup)
+            content: Current document content
+
+        Returns:
+            Formatted content (unchanged content if nothing needed formatting)
+        """
+        uri = self._open(file_path, content)
+        try:
+            edits = self._request("textDocument/formatting", {
+                "textDocument": {"uri": uri},
+                "options": {"tabSize": 4, "insertSpaces": True}
+            })
+        finally:
+            self._close_document(uri)
+
+        return apply_text_edits(content, edits or [])
+
+    def check(self, file_path: str, content: str) -> List[Dict]:
+        """
+        Lint a document.
+
+        Args:
+            file_path: Path of the document (used for configuration lookup)
+            content: Document content to lint
+
+        Returns:
+            Issues in the shape of `ruff check --output-format json` entries
+        """
+        uri = self._open(file_path, content)
+        try:
+            report = self._request("textDocument/diagnostic", {"textDocument": {"uri": uri}})
+        finally:
+            self._close_document(uri)
+
+        issues = []
+        for diagnostic in (report or {}).get("items", []):
+            start = diagnostic["range"]["start"]
+            issues.append({
+                "code": diagnostic.get("code") or "",
+                # Drop the "help: ..." paragraph the server appends
+                "message": diagnostic.get("message", "").split("\n\n", 1)[0],
+                "location": {"row": start["line"] + 1, "column": start["character"] + 1}
+            })
+
+        issues.sort(key=lambda issue: (issue["location"]["row"], issue["location"]["column"]))
+        return issues
+
+    def close(self) -> None:
+        """Shut the server down, killing it if it does not exit promptly."""
+        try:
+            if self.is_alive():
+                self._request("shutdown", None)
+                self._notify("exit", None)
+                self._process.wait(timeout=2)
+        except Exception:
+            pass
+        finally:
+            if self.is_alive():
+                self._process.kill()
+            self._process.wait()
+
+    def _open(self, file_path: str, content: str) -> str:
+        """Open a document on the server and return its URI."""
+        uri = Path(file_path).resolve().as_uri()
+        self._version += 1
+        self._notify("textDocument/didOpen", {
+            "textDocument": {
+                "uri": uri,
+                "languageId": "python",
+                "version": self._version,
+                "text": content
+            }
+        })
+        return uri
+
+    def _close_document(self, uri: str) -> None:
+        """Close a previously opened document."""
+        self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+
+    def _send(self, message: Dict) -> None:
+        """Write one JSON-RPC message with its Content-Length header."""
+        message["jsonrpc"] = "2.0"
+        body = dumps(message).encode()
+        try:
+            self._process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self._process.stdin.flush()
+        except OSError as e:
+            raise RuffServerError(f"ruff server connection lost: {e}")
+
+    def _notify(self, method: str, params: Any) -> None:
+        """Send a notification (no response expected)."""
+        self._send({"method": method, "params": params})
+
+    def _request(self, method: str, params: Any) -> Any:
+        """
+        Send a request and wait for its response.
+
+        Notifications received in the meantime are ignored and requests from
+        the server are answered with an empty result.
+
+        Raises:
+            RuffServerError: On timeout, lost connection or an error response
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        self._send({"id": request_id, "method": method, "params": params})
+
+        deadline = time.monotonic() + RESPONSE_TIMEOUT
+        while True:
+            message = self._read_message(deadline)
+            if "method" in message:
+                if "id" in message:
+                    self._send({"id": message["id"], "result": None})
+                continue
+            if message.get("id") != request_id:
+                continue
+            if "error" in message:
+                raise RuffServerError(f"{method} failed: {message['error'].get('message', '')}")
+            return message.get("result")
+
+    def _read_message(self, deadline: float) -> Dict:
+        """Read one JSON-RPC message, waiting at most until the deadline."""
+        while True:
+            header_end = self._buffer.find(b"\r\n\r\n")
+            if header_end != -1:
+                length = None
+                for header in self._buffer[:header_end].split(b"\r\n"):
+                    name, _, value = header.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                if length is None:
+                    raise RuffServerError("ruff server sent a message without Content-Length")
+
+                body_start = header_end + 4
+                if len(self._buffer) >= body_start + length:
+                    body = self._buffer[body_start:body_start + length]
+                    self._buffer = self._buffer[body_start + length:]
+                    return loads(body)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuffServerError("Timed out waiting for ruff server")
+
+            stdout = self._process.stdout
+            ready, _, _ = select.select([stdout], [], [], remaining)
+            if ready:
+                chunk = os.read(stdout.fileno(), 65536)
+                if not chunk:
+                    raise RuffServerError("ruff server exited")
+                self._buffer += chunk
+
+
+def apply_text_edits(content: str, edits: List[Dict]) -> str:
+    """
+    Apply LSP text edits with UTF-32 positions to a document.
+
+    Args:
+        content: Original document content
+        edits: Non-overlapping LSP TextEdit objects
+
+    Returns:
+        Edited content
+    """
+    if not edits:
+        return content
+
+    line_starts = [0] + [match.end() for match in _LINE_BREAK_RE.finditer(content)]
+
+    def offset(position: Dict) -> int:
+        line = position["line"]
+        if line >= len(line_starts):
+            return len(content)
+        return min(line_starts[line] + position["character"], len(content))
+
+    # Apply from the end so earlier offsets stay valid
+    spans = sorted(
+        ((offset(edit["range"]["start"]), offset(edit["range"]["end"]), edit["newText"]) for edit in edits),
+        reverse=True
+    )
+    for start, end, new_text in spans:
+        content = content[:start] + new_text + content[end:]
+    return content
+
+
+def enable_persistent_server() -> None:
+    """Allow get_ruff_client() to start and keep a ruff server for this process."""
+    global _persistent
+    _persistent = True
+
+
+def get_ruff_client() -> Optional[RuffServerClient]:
+    """
+    Get the shared ruff server client, starting the server if needed.
+
+    Returns:
+        Running client, or None if persistence is not enabled for this process
+        or a server has failed to start in it
+    """
+    global _client, _unavailable
+    if not _persistent or _unavailable:
+        return None
+
+    if _client is not None and not _client.is_alive():
+        _client = None
+
+    if _client is None:
+        try:
+            _client = RuffServerClient(os.getcwd())
+        except RuffServerError:
+            _unavailable = True
+            return None
+
+    return _client
+
+
+def reset_ruff_client() -> None:
+    """Shut down the shared server (e.g. after a failed request or on exit)."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -6,15 +6,40 @@ Provides functions for running tests, parsing results, managing test databases,
 and generating test coverage reports.
 """
 
+import hashlib
+import importlib
 import os
-import re
-import json
+import shutil
 import sqlite3
 import subprocess
+import sys
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from .file_utils import get_use_case_root, get_project_root
+from .json_utils import loads
+
+# Reports written by pytest-json-report and pytest-cov, relative to the use-case root
+TEST_REPORT_FILE = "test_report.json"
+COVERAGE_REPORT_FILE = "coverage.json"
+
+# Bytes of pytest's stdout/stderr kept in run results (the end of each stream)
+OUTPUT_TAIL_BYTES = 64 * 1024
+
+# Test database and its schema, relative to the use-case root
+TEST_DB_FILE = os.path.join("db", "test_hsa.db")
+SCHEMA_FILE = os.path.join("db", "schema.sql")
+
+# The test database is rebuilt from scratch whenever needed, so building it
+# skips the journal file and fsyncs
+_BUILD_PRAGMAS = "PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF; PRAGMA temp_store=MEMORY;"
+
+# Empty databases built from each schema, named by the schema's SQL digest
+TEMPLATE_DB_DIR = Path.home() / ".cache" / "claude_hooks" / "test_db_templates"
+
+# Schema path -> ((mtime_ns, size), schema SQL) for schemas read by this process
+_SCHEMA_CACHE: Dict[str, Tuple[Tuple[int, int], str]] = {}
 
 
 def run_pytest_and_capture(test_path: str = None, coverage: bool = True) -> Dict:
@@ -26,48 +51,67 @@ def run_pytest_and_capture(test_path: str = None, coverage: bool = True) -> Dict
         coverage: Whether to include coverage analysis
         
     Returns:
-        Dictionary with test results including stdout, stderr, return_code
+        Dictionary with test results including stdout, stderr (the last
+        OUTPUT_TAIL_BYTES of each), return_code and whether coverage was
+        collected
     """
     use_case_root = get_use_case_root()
     
-    # Build pytest command
-    cmd = ["python", "-m", "pytest"]
+    # Build pytest command; .pytest_cache is only needed for --lf/--sw
+    # reruns, which the hooks never use, so skip its I/O on every run
+    cmd = ["python", "-m", "pytest", "-p", "no:cacheprovider", "-p", "no:stepwise"]
     
     if test_path:
         cmd.append(test_path)
     else:
         cmd.append("tests/")
     
-    # Add coverage options if requested
+    # Add coverage options if requested (only the JSON report is read, so no
+    # terminal report is generated)
     if coverage:
         cmd.extend([
             "--cov=src",
-            "--cov-report=term-missing",
-            "--cov-report=json:coverage.json"
+            f"--cov-report=json:{COVERAGE_REPORT_FILE}"
         ])
     
-    # Add verbose output and JSON report
-    cmd.extend(["-v", "--tb=short", "--json-report", "--json-report-file=test_report.json"])
+    # Results are read from the JSON report, so keep console output quiet
+    cmd.extend(["-q", "--no-header", "--tb=short", "--json-report", f"--json-report-file={TEST_REPORT_FILE}"])
+    
+    # Run in the use-case directory; only the child process changes into it,
+    # so this process's working directory is never touched
+    run_dir = use_case_root if os.path.isdir(use_case_root) else os.curdir
     
     try:
-        # Change to use-case directory
-        original_dir = os.getcwd()
-        if os.path.exists(use_case_root):
-            os.chdir(use_case_root)
+        # Results are read back from the reports, so never leave a previous
+        # run's report behind for a run that fails to write one
+        stale_reports = [TEST_REPORT_FILE, COVERAGE_REPORT_FILE] if coverage else [TEST_REPORT_FILE]
+        for report_file in stale_reports:
+            try:
+                os.remove(os.path.join(run_dir, report_file))
+            except OSError:
+                pass
         
-        # Run pytest
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
+        # Run pytest with its output going straight to temporary files, so a
+        # noisy suite is never buffered in memory; only the tails are read
+        # back, as bytes decoded once so odd bytes in test output cannot fail
+        # the run with a UnicodeDecodeError
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            result = subprocess.run(
+                cmd,
+                stdout=stdout_file,
+                stderr=stderr_file,
+                timeout=300,  # 5 minute timeout
+                cwd=run_dir
+            )
+            stdout = _read_tail(stdout_file, OUTPUT_TAIL_BYTES)
+            stderr = _read_tail(stderr_file, OUTPUT_TAIL_BYTES)
         
         return {
-            "stdout": result.stdout,
-            "stderr": result.stderr,
+            "stdout": stdout.decode("utf-8", "replace"),
+            "stderr": stderr.decode("utf-8", "replace"),
             "return_code": result.returncode,
-            "command": " ".join(cmd)
+            "command": " ".join(cmd),
+            "coverage": coverage
         }
         
     except subprocess.TimeoutExpired:
@@ -75,24 +119,33 @@ def run_pytest_and_capture(test_path: str = None, coverage: bool = True) -> Dict
             "stdout": "",
             "stderr": "Test execution timed out after 5 minutes",
             "return_code": -1,
-            "command": " ".join(cmd)
+            "command": " ".join(cmd),
+            "coverage": coverage
         }
     except Exception as e:
         return {
             "stdout": "",
             "stderr": f"Error running tests: {str(e)}",
             "return_code": -1,
-            "command": " ".join(cmd)
+            "command": " ".join(cmd),
+            "coverage": coverage
         }
-    finally:
-        # Restore original directory
-        if 'original_dir' in locals():
-            os.chdir(original_dir)
+
+
+def _read_tail(file, max_bytes: int) -> bytes:
+    """Read at most the last max_bytes of a binary file object."""
+    size = file.seek(0, os.SEEK_END)
+    file.seek(max(0, size - max_bytes))
+    return file.read()
 
 
 def parse_test_results(test_output: Dict) -> Dict:
     """
-    Parse pytest output and extract meaningful information.
+    Parse the reports of a pytest run and extract meaningful information.
+    
+    Counts, timing and failures come from the pytest-json-report file and
+    coverage from coverage.py's JSON report, both written by
+    run_pytest_and_capture; the console output is not scraped.
     
     Args:
         test_output: Output from run_pytest_and_capture
@@ -113,72 +166,66 @@ def parse_test_results(test_output: Dict) -> Dict:
         "execution_time": None
     }
     
-    stdout = test_output["stdout"]
-    stderr = test_output["stderr"]
-    
-    # Parse test counts from output
-    test_summary_pattern = r"(\d+) failed,?\s*(\d+) passed"
-    passed_only_pattern = r"(\d+) passed"
-    failed_only_pattern = r"(\d+) failed"
-    
-    if re.search(test_summary_pattern, stdout):
-        match = re.search(test_summary_pattern, stdout)
-        result["failed"] = int(match.group(1))
-        result["passed"] = int(match.group(2))
-    elif re.search(passed_only_pattern, stdout):
-        match = re.search(passed_only_pattern, stdout)
-        result["passed"] = int(match.group(1))
-    elif re.search(failed_only_pattern, stdout):
-        match = re.search(failed_only_pattern, stdout)
-        result["failed"] = int(match.group(1))
-    
-    result["total"] = result["passed"] + result["failed"] + result["errors"] + result["skipped"]
-    
-    # Parse coverage information
-    coverage_pattern = r"TOTAL\s+\d+\s+\d+\s+(\d+)%"
-    coverage_match = re.search(coverage_pattern, stdout)
-    if coverage_match:
-        result["coverage_percent"] = int(coverage_match.group(1))
-    
-    # Parse missing coverage lines
-    missing_pattern = r"(.+?)\s+\d+\s+\d+\s+\d+%\s+(.+?)$"
-    for line in stdout.split('\n'):
-        if 'src/' in line and '%' in line:
-            match = re.search(missing_pattern, line)
-            if match and match.group(2).strip():
-                result["missing_coverage"].append({
-                    "file": match.group(1).strip(),
-                    "lines": match.group(2).strip()
-                })
+    use_case_root = get_use_case_root()
     
-    # Parse failure information
-    if "FAILURES" in stdout:
-        failure_section = stdout.split("FAILURES")[1].split("=")[0]
-        result["failures"].append(failure_section.strip()[:500])  # Limit length
+    report = _load_json_report(os.path.join(use_case_root, TEST_REPORT_FILE))
+    if report:
+        summary = report.get("summary", {})
+        result["passed"] = summary.get("passed", 0)
+        result["failed"] = summary.get("failed", 0)
+        result["errors"] = summary.get("error", 0)
+        result["skipped"] = summary.get("skipped", 0)
+        result["total"] = result["passed"] + result["failed"] + result["errors"] + result["skipped"]
+        result["execution_time"] = report.get("duration")
+        
+        for test in report.get("tests", []):
+            if test["outcome"] == "failed":
+                result["failures"].append({
+                    "test": test["nodeid"],
+                    "message": test.get("call", {}).get("longrepr", "")[:200]
+                })
     
-    # Try to read JSON report if available
-    try:
-        use_case_root = get_use_case_root()
-        json_report_path = os.path.join(use_case_root, "test_report.json")
-        if os.path.exists(json_report_path):
-            with open(json_report_path, 'r') as f:
-                json_data = json.load(f)
-                result["execution_time"] = json_data.get("duration", None)
-                
-                # More detailed test information from JSON
-                if "tests" in json_data:
-                    for test in json_data["tests"]:
-                        if test["outcome"] == "failed":
-                            result["failures"].append({
-                                "test": test["nodeid"],
-                                "message": test.get("call", {}).get("longrepr", "")[:200]
-                            })
-    except Exception:
-        pass  # JSON parsing is optional
+    if test_output.get("coverage", True):
+        coverage = _load_json_report(os.path.join(use_case_root, COVERAGE_REPORT_FILE))
+        if coverage:
+            totals = coverage.get("totals", {})
+            if "percent_covered_display" in totals:
+                # The rounded figure coverage.py shows in its terminal report
+                result["coverage_percent"] = int(float(totals["percent_covered_display"]))
+            
+            for path, file_data in coverage.get("files", {}).items():
+                missing_lines = file_data.get("missing_lines")
+                if missing_lines and path.startswith("src"):
+                    result["missing_coverage"].append({
+                        "file": path,
+                        "lines": _format_line_ranges(missing_lines)
+                    })
     
     return result
 
 
+def _load_json_report(report_path: str) -> Optional[Dict]:
+    """Load a JSON report file, or return None if it is missing or invalid."""
+    try:
+        with open(report_path, 'rb') as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _format_line_ranges(line_numbers: List[int]) -> str:
+    """Format sorted line numbers like coverage.py's term-missing column (e.g. "3-5, 9")."""
+    ranges = []
+    start = previous = line_numbers[0]
+    for line in line_numbers[1:]:
+        if line != previous + 1:
+            ranges.append(f"{start}-{previous}" if start != previous else str(start))
+            start = line
+        previous = line
+    ranges.append(f"{start}-{previous}" if start != previous else str(start))
+    return ", ".join(ranges)
+
+
 def get_test_coverage(file_path: str = None) -> Dict:
     """
     Get test coverage information for a specific file or overall.
@@ -190,14 +237,13 @@ def get_test_coverage(file_path: str = None) -> Dict:
         Coverage information dictionary
     """
     use_case_root = get_use_case_root()
-    coverage_file = os.path.join(use_case_root, "coverage.json")
-    
-    if not os.path.exists(coverage_file):
-        return {"error": "No coverage file found. Run tests with coverage first."}
+    coverage_file = os.path.join(use_case_root, COVERAGE_REPORT_FILE)
     
     try:
-        with open(coverage_file, 'r') as f:
-            coverage_data = json.load(f)
+        # orjson (via json_utils) when available: coverage reports of large
+        # projects run to megabytes
+        with open(coverage_file, 'rb') as f:
+            coverage_data = loads(f.read())
         
         if file_path:
             # Get coverage for specific file
@@ -218,46 +264,65 @@ def get_test_coverage(file_path: str = None) -> Dict:
                 "lines_missing": totals.get("missing_lines", 0),
                 "total_lines": totals.get("num_statements", 0)
             }
+    except FileNotFoundError:
+        return {"error": "No coverage file found. Run tests with coverage first."}
     except Exception as e:
         return {"error": f"Error reading coverage file: {str(e)}"}
 
 
-def clean_test_database(db_path: str = None) -> bool:
+def clean_test_database(db_path: str = None, fast: bool = True) -> bool:
     """
     Clean the test database by removing all data.
     
+    By default every table is dropped and the schema stored in the database
+    is reapplied, which costs the same however many rows the tables hold;
+    with fast=False the rows are deleted table by table. Either way the
+    work runs in one transaction on the existing file, so a failure leaves
+    the database as it was.
+    
     Args:
         db_path: Path to the database file (optional, defaults to test_hsa.db)
+        fast: Whether to drop and recreate the tables instead of deleting rows
         
     Returns:
         True if successful, False otherwise
     """
     if db_path is None:
-        use_case_root = get_use_case_root()
-        db_path = os.path.join(use_case_root, "db", "test_hsa.db")
+        db_path = os.path.join(get_use_case_root(), TEST_DB_FILE)
     
     try:
+        # Checked first because connecting would create the file
         if not os.path.exists(db_path):
             return True  # Database doesn't exist, consider it clean
         
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Get all table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        # Delete all data from each table
-        for table in tables:
-            table_name = table[0]
-            if table_name != 'sqlite_sequence':  # Skip system table
-                cursor.execute(f"DELETE FROM {table_name};")
-        
-        # Reset auto-increment counters
-        cursor.execute("DELETE FROM sqlite_sequence;")
-        
-        conn.commit()
-        conn.close()
+        try:
+            if fast:
+                statements = _recreate_schema_statements(conn)
+            else:
+                # Get all table names
+                objects = conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master WHERE type='table';").fetchall()
+                tables = [name for _, name, _, _ in objects]
+                
+                # Delete all data from each table, resetting auto-increment
+                # counters (sqlite_sequence) last, without per-row foreign
+                # key checks; virtual tables clear their own shadow tables
+                shadow_tables = _shadow_tables(conn, objects)
+                statements = [
+                    f"DELETE FROM {_quote_identifier(name)};"
+                    for name in tables if name != 'sqlite_sequence' and name not in shadow_tables
+                ]
+                if 'sqlite_sequence' in tables:
+                    statements.append("DELETE FROM sqlite_sequence;")
+            
+            try:
+                conn.executescript("PRAGMA foreign_keys=OFF; BEGIN; " + " ".join(statements) + " COMMIT;")
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        finally:
+            conn.close()
         
         return True
         
@@ -266,6 +331,68 @@ def clean_test_database(db_path: str = None) -> bool:
         return False
 
 
+def _quote_identifier(name: str) -> str:
+    """Quote a name as an SQL identifier."""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _shadow_tables(conn: sqlite3.Connection, objects: List[Tuple]) -> Set[str]:
+    """
+    Get the names of the shadow tables virtual tables keep their data in.
+    
+    Args:
+        conn: Connection to the database
+        objects: (type, name, tbl_name, sql) rows of sqlite_master
+        
+    Returns:
+        Shadow table names
+    """
+    try:
+        # SQLite 3.37+ reports them directly
+        return {name for _, name, type_, *_ in conn.execute("PRAGMA main.table_list;") if type_ == 'shadow'}
+    except sqlite3.Error:
+        pass
+    
+    # Older versions: tables named after a virtual table, e.g. FTS5's <name>_data
+    virtual_tables = {
+        name for type_, name, _, sql in objects
+        if type_ == 'table' and sql.lstrip().upper().startswith('CREATE VIRTUAL TABLE')
+    }
+    prefixes = tuple(f"{name}_" for name in virtual_tables)
+    return {
+        name for type_, name, _, _ in objects
+        if type_ == 'table' and prefixes and name.startswith(prefixes) and name not in virtual_tables
+    }
+
+
+def _recreate_schema_statements(conn: sqlite3.Connection) -> List[str]:
+    """
+    Build the statements that drop every table and view and recreate them empty.
+    
+    Dropping a table drops its indexes and triggers too, and the schema is
+    replayed from sqlite_master in creation order. Internal sqlite_* objects
+    and the shadow tables of virtual tables (e.g. FTS5's <name>_data) are
+    left to SQLite, which drops and recreates them with their owners.
+    
+    Args:
+        conn: Connection to the database
+        
+    Returns:
+        DROP statements followed by the schema's CREATE statements
+    """
+    objects = conn.execute(
+        "SELECT type, name, tbl_name, sql FROM sqlite_master WHERE sql IS NOT NULL "
+        "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY rowid;"
+    ).fetchall()
+    
+    shadow_tables = _shadow_tables(conn, objects)
+    objects = [obj for obj in objects if obj[2] not in shadow_tables]
+    
+    drops = [f"DROP VIEW IF EXISTS {_quote_identifier(name)};" for type_, name, _, _ in objects if type_ == 'view']
+    drops += [f"DROP TABLE IF EXISTS {_quote_identifier(name)};" for type_, name, _, _ in objects if type_ == 'table']
+    return drops + [f"{sql};" for _, _, _, sql in objects]
+
+
 def setup_test_database(schema_path: str = None) -> bool:
     """
     Set up the test database with the schema.
@@ -279,26 +406,33 @@ def setup_test_database(schema_path: str = None) -> bool:
     use_case_root = get_use_case_root()
     
     if schema_path is None:
-        schema_path = os.path.join(use_case_root, "db", "schema.sql")
+        schema_path = os.path.join(use_case_root, SCHEMA_FILE)
     
-    db_path = os.path.join(use_case_root, "db", "test_hsa.db")
+    db_path = os.path.join(use_case_root, TEST_DB_FILE)
     
     try:
         # Ensure db directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        # Remove existing database
-        if os.path.exists(db_path):
+        # Remove existing database (attempting it costs no more than
+        # checking for it first)
+        try:
             os.remove(db_path)
+        except FileNotFoundError:
+            pass
         
-        # Create new database with schema
-        if os.path.exists(schema_path):
-            with open(schema_path, 'r') as f:
-                schema_sql = f.read()
-            
-            conn = sqlite3.connect(db_path)
-            conn.executescript(schema_sql)
-            conn.close()
+        # Create new database with schema, if there is one
+        schema_sql = _read_schema(schema_path)
+        if schema_sql is None:
+            return True
+        
+        # Copying a database built once per schema beats replaying the DDL
+        try:
+            template_path = _template_database(schema_sql)
+        except OSError:
+            _build_database(db_path, schema_sql)  # Cache not writable
+        else:
+            shutil.copyfile(template_path, db_path)
         
         return True
         
@@ -307,6 +441,77 @@ def setup_test_database(schema_path: str = None) -> bool:
         return False
 
 
+def _build_database(db_path: str, schema_sql: str) -> None:
+    """Create a database file and apply a schema to it."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(_BUILD_PRAGMAS)
+        conn.executescript(schema_sql)
+    finally:
+        conn.close()
+
+
+def _template_database(schema_sql: str) -> str:
+    """
+    Get an empty database built from a schema, building it on first use.
+    
+    Templates are named by the digest of the schema SQL, so an edited
+    schema simply gets a new template.
+    
+    Args:
+        schema_sql: Schema to apply
+        
+    Returns:
+        Path to the template database (copy it; never open it for writing)
+        
+    Raises:
+        OSError: If the template cannot be written to the cache directory
+    """
+    template_path = TEMPLATE_DB_DIR / f"{hashlib.sha1(schema_sql.encode()).hexdigest()}.db"
+    if template_path.exists():
+        return str(template_path)
+    
+    TEMPLATE_DB_DIR.mkdir(parents=True, exist_ok=True)
+    # Build under a temporary name so concurrent hooks never copy a partial file
+    temp_path = f"{template_path}.{os.getpid()}"
+    try:
+        _build_database(temp_path, schema_sql)
+        os.replace(temp_path, template_path)
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return str(template_path)
+
+
+def _read_schema(schema_path: str) -> Optional[str]:
+    """
+    Read a schema file, reusing the text read earlier in this process while
+    the file's mtime and size are unchanged.
+    
+    Args:
+        schema_path: Path to the schema file
+        
+    Returns:
+        Schema SQL, or None if the file does not exist
+    """
+    try:
+        st = os.stat(schema_path)
+    except FileNotFoundError:
+        return None
+    
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _SCHEMA_CACHE.get(schema_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    with open(schema_path, 'r') as f:
+        schema_sql = f.read()
+    _SCHEMA_CACHE[schema_path] = (key, schema_sql)
+    return schema_sql
+
+
 def generate_factory_fixtures(factory_name: str, count: int = 10) -> bool:
     """
     Generate test fixtures using Factory Boy factories.
@@ -318,41 +523,30 @@ def generate_factory_fixtures(factory_name: str, count: int = 10) -> bool:
     Returns:
         True if successful, False otherwise
     """
+    if not factory_name.isidentifier():
+        print(f"Invalid factory name: {factory_name!r}")
+        return False
+    
     try:
         use_case_root = get_use_case_root()
+        if use_case_root not in sys.path:
+            sys.path.append(use_case_root)
         
-        # This would typically import and use Factory Boy factories
-        # For now, we'll create a simple implementation
-        script_content = f"""
-import sys
-sys.path.append('{use_case_root}')
-
-try:
-    from src.test_utils.factories import {factory_name}
-    
-    # Generate {count} fixtures
-    fixtures = []
-    for i in range({count}):
-        fixture = {factory_name}.create()
-        fixtures.append(fixture)
-    
-    print(f"Generated {{len(fixtures)}} {{'{factory_name}'}} fixtures")
-except ImportError as e:
-    print(f"Could not import factory {{'{factory_name}'}}: {{e}}")
-except Exception as e:
-    print(f"Error generating fixtures: {{e}}")
-"""
-        
-        # Execute the script
-        result = subprocess.run(
-            ["python", "-c", script_content],
-            capture_output=True,
-            text=True,
-            cwd=use_case_root
-        )
+        # Imported in this process (as prepare_test_db does) rather than in a
+        # child interpreter, which paid interpreter start-up on every call
+        factories = importlib.import_module("src.test_utils.factories")
+        factory = getattr(factories, factory_name, None)
+        if factory is None:
+            print(f"Could not import factory {factory_name}: not defined in src.test_utils.factories")
+            return False
         
-        return result.returncode == 0
+        fixtures = [factory.create() for _ in range(count)]
+        print(f"Generated {len(fixtures)} {factory_name} fixtures")
+        return True
         
+    except ImportError as e:
+        print(f"Could not import factory {factory_name}: {str(e)}")
+        return False
     except Exception as e:
         print(f"Error generating factory fixtures: {str(e)}")
         return False
\ No newline at end of file